@@ -1,9 +1,12 @@
 import argparse
 import asyncio
+import datetime
 import logging
 
 import io
 import os
+import random
+import time
 import urllib
 
 from dotenv import load_dotenv
@@ -13,10 +16,14 @@ import gspread
 import google.auth
 from google.cloud import run_v2, secretmanager_v1
 
+from src import metrics
+from src.models.delivery_provider import DeliveryProviders
 from src.signal.bot import SignalBot
 from src.prom.client import PromAPIClient
+from src.sessions import SessionFactory
 
 from src.allbuy_bot import AllBuyBot
+from src.retry_queue import RetryQueue
 from src.prom.exceptions import (
     OutdatedCookiesError,
 )
@@ -33,9 +40,10 @@ logging.basicConfig(
 )
 
 def read_orders(client: gspread.client.Client, name: str) -> dict:
-    sheet = client.open("AllBuy Storage").worksheet(name)
+    with metrics.timer("read_orders"):
+        sheet = client.open("AllBuy Storage").worksheet(name)
+        data = sheet.get_all_values()
 
-    data = sheet.get_all_values()
     result = {}
 
     # Convert to JSON format
@@ -49,8 +57,6 @@ def read_orders(client: gspread.client.Client, name: str) -> dict:
 
 
 def write_orders(client: gspread.client.Client, name: str, orders: dict):
-    sheet = client.open("AllBuy Storage").worksheet(name)
-
     headers = set()
     for order in orders.values():
         headers.update(order.keys())
@@ -84,21 +90,68 @@ def write_orders(client: gspread.client.Client, name: str, orders: dict):
                     row.append(val)
             res.append(row)
 
-    sheet.clear()
-    sheet.append_row(headers)
-    sheet.append_rows(res)
+    with metrics.timer("write_orders"):
+        spreadsheet = client.open("AllBuy Storage")
+        try:
+            sheet = spreadsheet.worksheet(name)
+        except gspread.exceptions.WorksheetNotFound:
+            sheet = spreadsheet.add_worksheet(name, rows=1, cols=len(headers))
+        sheet.clear()
+        sheet.append_row(headers)
+        sheet.append_rows(res)
+
+
+def read_retry_queue(client: gspread.client.Client, max_attempts: int) -> RetryQueue:
+    try:
+        entries = read_orders(client, "Retry")
+    except gspread.exceptions.WorksheetNotFound:
+        entries = {}
+    return RetryQueue(entries, max_attempts=max_attempts)
+
+
+def write_state(client: gspread.client.Client, allbuy_bot: AllBuyBot):
+    write_orders(client, "Paid", allbuy_bot.paid_orders)
+    write_orders(client, "Pending", allbuy_bot.pending_orders)
+    write_orders(client, "Retry", allbuy_bot.retry_queue.entries)
 
 # Define the scope
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
 
 
-def get_cookies():
+def load_config(override: bool = False):
+    """Load the configuration into the environment from local.env if it
+    exists, or from the ALLBUYBOTCONF secret."""
+    if os.path.exists("local.env"):
+        load_dotenv("local.env", override=True)
+        return
+
+    secret_client = secretmanager_v1.SecretManagerServiceClient()
+    _, project_id = google.auth.default()
+    response = secret_client.access_secret_version(
+        name=f"projects/{project_id}/secrets/ALLBUYBOTCONF/versions/latest"
+    )
+    payload = response.payload.data.decode("UTF-8")
+    load_dotenv(stream=io.StringIO(payload), override=override)
+
+
+def get_cookies(reload: bool = False):
+    if reload:
+        load_config(override=True)
     return os.getenv("COOKIES")
 
 
 logger = logging.getLogger(__name__)
 
 
+def parse_provider_concurrency(limits: list[str]) -> dict[int, int]:
+    result = {}
+    for limit in limits:
+        name, _, value = limit.partition("=")
+        provider = DeliveryProviders[name.strip().upper()].value
+        result[provider.id] = int(value)
+    return result
+
+
 def parse_arguments():
     """
     Parse command-line arguments into a dictionary using argparse.
@@ -156,9 +209,102 @@ def parse_arguments():
         default=os.getenv("ADMIN_PHONE")
     )
 
+    parser.add_argument(
+        "--concurrency", help="Maximum number of orders processed concurrently",
+        type=int, default=int(os.getenv("CONCURRENCY", "1"))
+    )
+
+    parser.add_argument(
+        "--provider-concurrency",
+        help="Per delivery provider limit, e.g. NOVA_POSHTA=2 (may be repeated)",
+        action="append",
+        default=[
+            limit for limit in os.getenv("PROVIDER_CONCURRENCY", "").split(",") if limit
+        ],
+    )
+
+    parser.add_argument(
+        "--full-sweep-interval",
+        help="Minutes between full refreshes of Paid/Pending orders; "
+             "runs in between only fetch orders modified since the last one",
+        type=int, default=os.getenv("FULL_SWEEP_INTERVAL")
+    )
+
+    parser.add_argument(
+        "--serve", help="Keep running and refresh the shop periodically",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--interval", help="Seconds between refreshes in --serve mode",
+        type=float, default=float(os.getenv("REFRESH_INTERVAL", "600"))
+    )
+
+    parser.add_argument(
+        "--jitter", help="Random +/- seconds added to --interval",
+        type=float, default=float(os.getenv("REFRESH_JITTER", "30"))
+    )
+
+    parser.add_argument(
+        "--retry-only", help="Only retry the failed declarations that are due",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--retry-interval", help="Seconds between retry passes in --serve mode (0 disables)",
+        type=float, default=float(os.getenv("RETRY_INTERVAL", "60"))
+    )
+
+    parser.add_argument(
+        "--retry-max-attempts", help="Failed declaration attempts before an order is given up",
+        type=int, default=int(os.getenv("RETRY_MAX_ATTEMPTS", "5"))
+    )
+
+    parser.add_argument(
+        "--metrics-file", help="Write Prometheus metrics to this textfile after every refresh",
+        default=os.getenv("METRICS_FILE")
+    )
+
+    parser.add_argument(
+        "--metrics-port", help="Serve Prometheus metrics on this port in --serve mode",
+        type=int, default=os.getenv("METRICS_PORT")
+    )
+
+    parser.add_argument(
+        "--prom-url", help="Prom base URL for the API and the cabinet (e.g. a cassette proxy)",
+        default=os.getenv("PROM_URL", "https://my.prom.ua/")
+    )
+
+    parser.add_argument(
+        "--prom-rate", help="Initial and maximum Prom API requests per second per endpoint group",
+        type=float, default=float(os.getenv("PROM_RATE", "10"))
+    )
+
+    parser.add_argument(
+        "--status-batch-window",
+        help="Collect order status changes for this many seconds and send them together",
+        type=float, default=os.getenv("STATUS_BATCH_WINDOW")
+    )
+
+    parser.add_argument(
+        "--http-limit", help="Maximum number of open HTTP connections",
+        type=int, default=int(os.getenv("HTTP_LIMIT", "100"))
+    )
+
+    parser.add_argument(
+        "--http-limit-per-host", help="Maximum number of open HTTP connections per host",
+        type=int, default=int(os.getenv("HTTP_LIMIT_PER_HOST", "20"))
+    )
+
     # Parse the arguments
     args = parser.parse_args()
 
+    if args.serve and args.order_id:
+        parser.error("--order-id cannot be used with --serve")
+
+    if args.retry_only and (args.serve or args.order_id):
+        parser.error("--retry-only cannot be used with --serve or --order-id")
+
     # Convert to a dictionary
     return args
 
@@ -167,6 +313,11 @@ async def main():
     parsed_data = parse_arguments()
     creds, project_id = google.auth.default(scopes=scope)
     
+    session_factory = SessionFactory(
+        limit=parsed_data.http_limit,
+        limit_per_host=parsed_data.http_limit_per_host,
+    )
+
     signal_local = parsed_data.signal_local
     use_local_signal = False
     signal_bot = None
@@ -176,7 +327,8 @@ async def main():
             "signal_service": signal_local,
             "phone_number": parsed_data.signal_phone,
             "group_id": parsed_data.signal_group,
-            "force": parsed_data.force
+            "force": parsed_data.force,
+            "session_factory": session_factory,
         })
         use_local_signal = await signal_bot.health()
         if not use_local_signal:
@@ -204,11 +356,16 @@ async def main():
                 "signal_service": signal_service,
                 "phone_number": parsed_data.signal_phone,
                 "group_id": parsed_data.signal_group,
-                "force": parsed_data.force
+                "force": parsed_data.force,
+                "session_factory": session_factory,
             })
 
     prom_client = PromAPIClient(
         parsed_data.prom_token,
+        base_url=urllib.parse.urljoin(parsed_data.prom_url, "api/v1/"),
+        session_factory=session_factory,
+        requests_per_second=parsed_data.prom_rate,
+        status_batch_window=parsed_data.status_batch_window,
     )
 
     # db = firestore.Client(database="all-buy-firestore")
@@ -237,20 +394,60 @@ async def main():
         paid_orders=paid_orders,
         pending_orders=pending_orders,
         admin_phone=parsed_data.admin_phone,
+        concurrency=parsed_data.concurrency,
+        provider_concurrency=parse_provider_concurrency(parsed_data.provider_concurrency),
+        full_sweep_interval=(
+            datetime.timedelta(minutes=parsed_data.full_sweep_interval)
+            if parsed_data.full_sweep_interval else None
+        ),
+        scraper_base_url=parsed_data.prom_url,
+        session_factory=session_factory,
+        retry_queue=read_retry_queue(gspread_client, parsed_data.retry_max_attempts),
     )
 
     try:
-        await allbuy_bot.refresh_shop(orders=parsed_data.order_id)
-    except OutdatedCookiesError:
-        if signal_bot:
-            await signal_bot.send(
-                "Авторизаційні дані застаріли. Потрібно оновити Cookies.",
-                "Наразі опрацювання нових замовлень неможливе."
+        if parsed_data.serve:
+            if parsed_data.metrics_port:
+                await metrics.registry.serve(parsed_data.metrics_port)
+
+            await serve(
+                allbuy_bot, gspread_client, signal_bot,
+                interval=parsed_data.interval,
+                jitter=parsed_data.jitter,
+                retry_interval=parsed_data.retry_interval,
+                metrics_file=parsed_data.metrics_file,
+            )
+        elif parsed_data.retry_only:
+            await retry(allbuy_bot, gspread_client, metrics_file=parsed_data.metrics_file)
+        else:
+            await refresh(
+                allbuy_bot, gspread_client, signal_bot,
+                order_ids=parsed_data.order_id,
+                metrics_file=parsed_data.metrics_file,
             )
+    finally:
+        await session_factory.close()
+
+
+async def refresh(
+    allbuy_bot: AllBuyBot,
+    gspread_client: gspread.client.Client,
+    signal_bot: SignalBot | None,
+    order_ids: list[str] | None = None,
+    notify_outdated_cookies: bool = True,
+    metrics_file: str | None = None,
+) -> bool:
+    """Run one refresh and persist the state. Returns False if the cookies are outdated."""
+    try:
+        with metrics.timer("refresh_shop"):
+            await allbuy_bot.refresh_shop(orders=order_ids)
+    except OutdatedCookiesError:
+        if signal_bot and notify_outdated_cookies:
+            await send_outdated_cookies(signal_bot)
+        return False
     else:
-        if not parsed_data.order_id:
-            write_orders(gspread_client, "Paid", allbuy_bot.paid_orders)
-            write_orders(gspread_client, "Pending", allbuy_bot.pending_orders)
+        if not order_ids:
+            write_state(gspread_client, allbuy_bot)
 
             # for doc in db.collection("paid_orders").stream():
             #     if doc.id not in allbuy_bot.paid_orders:
@@ -267,20 +464,114 @@ async def main():
 
             # for order, data in allbuy_bot.pending_orders.items():
             #     db.collection("pending_orders").document(order).set(data)
+    finally:
+        if metrics_file:
+            metrics.registry.write_textfile(metrics_file)
+
+    if allbuy_bot.cookies_outdated:
+        if signal_bot and notify_outdated_cookies:
+            await send_outdated_cookies(signal_bot)
+        return False
+    return True
+
+
+async def send_outdated_cookies(signal_bot: SignalBot):
+    await signal_bot.send(
+        "Авторизаційні дані застаріли. Потрібно оновити Cookies.\n"
+        "Наразі опрацювання нових замовлень неможливе."
+    )
+
+
+async def retry(
+    allbuy_bot: AllBuyBot,
+    gspread_client: gspread.client.Client,
+    metrics_file: str | None = None,
+) -> int:
+    """Retry the due declarations and persist the state if anything was retried."""
+    try:
+        with metrics.timer("retry_due"):
+            retried = await allbuy_bot.retry_due()
+        if retried:
+            write_state(gspread_client, allbuy_bot)
+    finally:
+        if metrics_file:
+            metrics.registry.write_textfile(metrics_file)
+    return retried
+
+
+async def reload_cookies(allbuy_bot: AllBuyBot):
+    """Re-read the cookies from the configuration and switch the scrapers
+    to them if they were updated."""
+    try:
+        cookies = await asyncio.to_thread(get_cookies, reload=True)
+    except Exception:
+        logger.exception("Could not re-read the cookies")
+        return
+    if cookies and cookies != allbuy_bot.director.cookies:
+        logger.info("Cookies were updated, rebuilding the scraper session")
+        await allbuy_bot.director.update_cookies(cookies)
+
+
+async def serve(
+    allbuy_bot: AllBuyBot,
+    gspread_client: gspread.client.Client,
+    signal_bot: SignalBot | None,
+    interval: float,
+    jitter: float = 0,
+    retry_interval: float = 0,
+    metrics_file: str | None = None,
+):
+    """Keep the clients warm and refresh the shop every ``interval`` seconds.
+    In between, due declaration retries are run every ``retry_interval``
+    seconds.
+
+    The in-memory state is authoritative between cycles; it is re-read from
+    the sheets only after a cycle that did not persist it. After a cycle
+    that found the cookies outdated, they are re-read from the configuration
+    so updated cookies are picked up without a restart.
+    """
+    reload_state = False
+    cookies_valid = True
+
+    while True:
+        try:
+            if not cookies_valid:
+                await reload_cookies(allbuy_bot)
+
+            if reload_state:
+                logger.info("Reloading orders state")
+                allbuy_bot.paid_orders = read_orders(gspread_client, "Paid")
+                allbuy_bot.pending_orders = read_orders(gspread_client, "Pending")
+                allbuy_bot.retry_queue = read_retry_queue(
+                    gspread_client, allbuy_bot.retry_queue.max_attempts,
+                )
+
+            # Only the first cycle that hits outdated cookies notifies the chat.
+            cookies_valid = await refresh(
+                allbuy_bot, gspread_client, signal_bot,
+                notify_outdated_cookies=cookies_valid,
+                metrics_file=metrics_file,
+            )
+            reload_state = not cookies_valid
+        except Exception:
+            logger.exception("Refresh cycle failed")
+            reload_state = True
+
+        delay = max(0.0, interval + random.uniform(-jitter, jitter))
+        logger.info("Next refresh in %.0f seconds", delay)
+        next_refresh = time.monotonic() + delay
+        while (remaining := next_refresh - time.monotonic()) > 0:
+            await asyncio.sleep(min(remaining, retry_interval or remaining))
+            if retry_interval and not reload_state and time.monotonic() < next_refresh:
+                try:
+                    await retry(allbuy_bot, gspread_client, metrics_file=metrics_file)
+                except Exception:
+                    logger.exception("Retry pass failed")
+                    reload_state = True
 
 
 if __name__ == "__main__":
 
-    params = {}
-    if not os.path.exists("local.env"):
-        secret_client = secretmanager_v1.SecretManagerServiceClient()
-        _, project_id = google.auth.default()
-        response = secret_client.access_secret_version(
-            name=f"projects/{project_id}/secrets/ALLBUYBOTCONF/versions/latest"
-        )
-        payload = response.payload.data.decode("UTF-8")
-        load_dotenv(stream=io.StringIO(payload))
-    else:
-        load_dotenv("local.env", override=True)
+    load_config()
 
     asyncio.run(main())
@@ -0,0 +1,264 @@
+"""Record/replay proxy for the Prom API and cabinet endpoints.
+
+Record real traffic by pointing the bot at the proxy:
+
+    python -m benchmarks.cassette record --cassette run.json.gz --upstream https://my.prom.ua
+    python __main__.py --prom-url http://127.0.0.1:8765/ ...
+
+and serve it back later without touching production:
+
+    python -m benchmarks.cassette replay --cassette run.json.gz --latency 0.05
+
+Cookies, csrf tokens, the API token and other credentials are redacted
+before anything is written. Cassettes are gzipped JSON.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import time
+from collections import Counter, defaultdict
+
+import aiohttp
+from aiohttp import web
+
+from src import codec
+
+
+VERSION = 1
+REDACTED = "REDACTED"
+# JSON keys whose values are credentials, matched case-insensitively.
+SECRET_KEYS = ("csrf", "token", "cookie", "password", "secret", "authorization", "session")
+# Request headers forwarded upstream; cookies and auth pass through but are
+# never stored.
+HOP_HEADERS = {"host", "content-length", "transfer-encoding", "connection", "accept-encoding"}
+KEPT_RESPONSE_HEADERS = ("Retry-After",)
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if any(secret in key.lower() for secret in SECRET_KEYS) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def redact_query(query: list) -> list:
+    return [
+        [key, REDACTED if any(secret in key.lower() for secret in SECRET_KEYS) else value]
+        for key, value in query
+    ]
+
+
+def redact_body(text: str, content_type: str) -> str:
+    if not text or "json" not in content_type:
+        return text
+    try:
+        return codec.dumps(redact(codec.loads(text)))
+    except ValueError:
+        return text
+
+
+def request_key(method: str, path: str, query: list, body: str) -> tuple:
+    digest = hashlib.sha1(body.encode("utf-8")).hexdigest() if body else ""
+    return (method, path, tuple(sorted(map(tuple, query))), digest)
+
+
+def load(path: str) -> list[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        cassette = codec.loads(file.read())
+    if cassette.get("version") != VERSION:
+        raise ValueError(f"Unsupported cassette version {cassette.get('version')!r} in {path}")
+    return cassette["interactions"]
+
+
+def save(path: str, interactions: list[dict]):
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        file.write(codec.dumps({"version": VERSION, "interactions": interactions}))
+
+
+class CassetteServer:
+    """Proxy that records upstream interactions or replays recorded ones.
+
+    Replay matches on method, path, query and a hash of the redacted request
+    body, then falls back to method, path and query. Repeated requests get
+    the recorded responses in order, and the last one once they run out.
+    """
+
+    def __init__(
+        self,
+        cassette: str,
+        mode: str = "replay",
+        upstream: str | None = None,
+        latency: float = 0.0,
+        recorded_latency: bool = False,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode {mode!r}")
+        if mode == "record" and not upstream:
+            raise ValueError("Recording needs an upstream URL")
+
+        self.cassette = cassette
+        self.mode = mode
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.latency = latency
+        self.recorded_latency = recorded_latency
+        self.interactions = []
+        self.requests = Counter()
+        self.misses = []
+        self.exact = defaultdict(list)
+        self.loose = defaultdict(list)
+        self.served = Counter()
+        self.session = None
+        self.runner = None
+        self.url = None
+
+        if mode == "replay":
+            for interaction in load(cassette):
+                request = interaction["request"]
+                key = request_key(
+                    request["method"], request["path"], request["query"], request["body"],
+                )
+                self.exact[key].append(interaction)
+                self.loose[key[:3]].append(interaction)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests[request.path] += 1
+        body = await request.text()
+        query = [list(item) for item in request.query.items()]
+        if self.mode == "record":
+            return await self.record(request, body, query)
+        return await self.replay(request, body, query)
+
+    async def record(self, request: web.Request, body: str, query: list) -> web.Response:
+        headers = {
+            name: value for name, value in request.headers.items()
+            if name.lower() not in HOP_HEADERS
+        }
+        start = time.perf_counter()
+        async with self.session.request(
+            request.method,
+            f"{self.upstream}{request.rel_url}",
+            headers=headers,
+            data=body.encode("utf-8") if body else None,
+            allow_redirects=False,
+        ) as resp:
+            text = await resp.text()
+            elapsed = time.perf_counter() - start
+            content_type = resp.content_type
+            response_headers = {
+                name: resp.headers[name] for name in KEPT_RESPONSE_HEADERS if name in resp.headers
+            }
+            status = resp.status
+
+        self.interactions.append({
+            "request": {
+                "method": request.method,
+                "path": request.path,
+                "query": redact_query(query),
+                "body": redact_body(body, request.content_type),
+            },
+            "response": {
+                "status": status,
+                "content_type": content_type,
+                "headers": response_headers,
+                "body": redact_body(text, content_type),
+            },
+            "elapsed": round(elapsed, 4),
+        })
+        return web.Response(
+            status=status, text=text, content_type=content_type, headers=response_headers,
+        )
+
+    async def replay(self, request: web.Request, body: str, query: list) -> web.Response:
+        key = request_key(
+            request.method, request.path, redact_query(query),
+            redact_body(body, request.content_type),
+        )
+        candidates = self.exact.get(key) or self.loose.get(key[:3])
+        if not candidates:
+            self.misses.append(f"{request.method} {request.rel_url}")
+            return web.json_response({"error": "Not recorded"}, status=404)
+
+        served = self.served[key]
+        self.served[key] += 1
+        interaction = candidates[min(served, len(candidates) - 1)]
+
+        delay = interaction.get("elapsed", 0.0) if self.recorded_latency else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+
+        response = interaction["response"]
+        return web.Response(
+            status=response["status"],
+            text=response["body"],
+            content_type=response["content_type"],
+            headers=response["headers"],
+        )
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        if self.mode == "record":
+            self.session = aiohttp.ClientSession(auto_decompress=True)
+        app = web.Application()
+        app.router.add_route("*", "/{path:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.mode == "record":
+            save(self.cassette, self.interactions)
+        if self.session:
+            await self.session.close()
+        if self.runner:
+            await self.runner.cleanup()
+
+
+async def run(args):
+    server = CassetteServer(
+        args.cassette,
+        mode=args.mode,
+        upstream=args.upstream,
+        latency=args.latency,
+        recorded_latency=args.recorded_latency,
+    )
+    url = await server.start(port=args.port)
+    print(f"{args.mode.capitalize()}ing {args.cassette} on {url}/ (Ctrl+C to stop)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(f"{sum(server.requests.values())} requests, {len(server.misses)} not recorded")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--upstream", default="https://my.prom.ua")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Replay delay per request, s")
+    parser.add_argument(
+        "--recorded-latency", action="store_true",
+        help="Replay with the latency observed while recording",
+    )
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
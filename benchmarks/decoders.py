@@ -0,0 +1,53 @@
+"""Compare the generated model decoders with dacite.from_dict.
+
+    python -m benchmarks.decoders --records 10000
+"""
+
+import argparse
+import time
+
+import dacite
+
+from benchmarks.fake_prom import synthetic_orders, synthetic_products
+from src.models.decoders import TYPE_HOOKS, decoder
+from src.models.order import Order
+from src.models.product import Product
+
+
+def best_of(func, records, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for record in records:
+            func(record)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    config = dacite.Config(type_hooks=TYPE_HOOKS)
+    datasets = [
+        (Order, synthetic_orders(args.records)),
+        (Product, synthetic_products(args.records)),
+    ]
+
+    print(f"{'model':>8} {'records':>8} {'dacite s':>9} {'decoder s':>10} {'speedup':>8}")
+    for cls, records in datasets:
+        decode = decoder(cls)
+        slow = best_of(
+            lambda record: dacite.from_dict(cls, record, config=config), records, args.repeat,
+        )
+        fast = best_of(decode, records, args.repeat)
+        print(
+            f"{cls.__name__:>8} {len(records):>8} {slow:>9.3f} {fast:>10.3f} "
+            f"{slow / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Local stand-in for my.prom.ua (API and the scraped cabinet endpoints)
+and for the Signal REST API, used by the benchmarks."""
+
+import asyncio
+import datetime
+import random
+from collections import Counter
+
+import ujson
+from aiohttp import web
+
+# The fixtures are shared with the unit tests.
+from tests.helpers import CSRF_TOKEN, fake_cookies, synthetic_orders, synthetic_products
+
+
+OWNER_ID = 4242
+
+
+class FakeProm:
+    def __init__(
+        self,
+        orders: list[dict] | None = None,
+        products: list[dict] | None = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_prefix: str = "/api/",
+        seed: int = 0,
+    ):
+        self.orders = {order["id"]: order for order in orders or []}
+        self.products = products or []
+        self.latency = latency
+        self.error_rate = error_rate
+        # Scrapers do not retry, so by default only the API sees failures.
+        self.error_prefix = error_prefix
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.messages = []
+        self.runner = None
+        self.url = None
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        self.requests[request.path] += 1
+        if self.latency:
+            # +/-50% around the configured latency.
+            await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if (
+            self.error_rate and
+            request.path.startswith(self.error_prefix) and
+            self.random.random() < self.error_rate
+        ):
+            return web.json_response({"error": "Injected failure"}, status=503)
+        return await handler(request)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get("/api/v1/orders/list", self.orders_list)
+        app.router.add_get("/api/v1/orders/{id:\\d+}", self.order_get)
+        app.router.add_post("/api/v1/orders/set_status", self.orders_set_status)
+        app.router.add_get("/api/v1/products/list", self.products_list)
+        app.router.add_post("/api/v1/products/edit", self.products_edit)
+
+        app.router.add_get("/remote/auth/info", self.auth_info)
+        app.router.add_get("/remote/order_api/get_order", self.scraped_order)
+        app.router.add_get(
+            "/remote/delivery/nova_poshta/init_data_order", self.np_init_data_order,
+        )
+        app.router.add_post(
+            "/market/application/nova_poshta/delivery_info", self.np_delivery_info,
+        )
+        app.router.add_get(
+            "/remote/delivery/ukrposhta/init_data_order", self.empty_init_data_order,
+        )
+        app.router.add_post(
+            "/remote/new_delivery/ukrposhta/generate_declaration", self.declaration,
+        )
+        app.router.add_get(
+            "/remote/new_delivery/meest_express/init_data_order", self.meest_init_data_order,
+        )
+        app.router.add_post(
+            "/remote/new_delivery/meest_express/generate_declaration", self.declaration,
+        )
+        app.router.add_post(
+            "/remote/delivery/rozetka_delivery/create_declaration", self.declaration,
+        )
+
+        app.router.add_get("/v1/health", self.signal_health)
+        app.router.add_post("/v2/send", self.signal_send)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    # Prom API
+
+    async def orders_list(self, request: web.Request) -> web.Response:
+        query = request.query
+        limit = min(int(query.get("limit", 100)), 100)
+        last_id = int(query["last_id"]) if "last_id" in query else None
+        status = query.get("status")
+        modified_from = query.get("last_modified_from")
+
+        orders = []
+        for order_id in sorted(self.orders, reverse=True):
+            order = self.orders[order_id]
+            if last_id is not None and order_id >= last_id:
+                continue
+            if status and order["status"] != status:
+                continue
+            if modified_from and order["date_modified"] < modified_from:
+                continue
+            orders.append(order)
+            if len(orders) == limit:
+                break
+        return web.json_response({"orders": orders}, dumps=ujson.dumps)
+
+    async def order_get(self, request: web.Request) -> web.Response:
+        order = self.orders.get(int(request.match_info["id"]))
+        if order is None:
+            return web.json_response({"error": "Order not found"}, status=404)
+        return web.json_response({"order": order}, dumps=ujson.dumps)
+
+    async def orders_set_status(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        modified = datetime.datetime.now().replace(microsecond=0).isoformat()
+        for order_id in body["ids"]:
+            if order := self.orders.get(order_id):
+                order["status"] = body["status"]
+                order["date_modified"] = modified
+        return web.json_response({"processed_ids": body["ids"]})
+
+    async def products_list(self, request: web.Request) -> web.Response:
+        limit = min(int(request.query.get("limit", 100)), 100)
+        last_id = int(request.query.get("last_id", 0))
+        products = [product for product in self.products if product["id"] > last_id]
+        return web.json_response({"products": products[:limit]}, dumps=ujson.dumps)
+
+    async def products_edit(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({"processed_ids": [product["id"] for product in body]})
+
+    # Cabinet endpoints used by the scrapers
+
+    async def auth_info(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": OWNER_ID})
+
+    async def scraped_order(self, request: web.Request) -> web.Response:
+        order_id = int(request.query["id"])
+        order = self.orders.get(order_id, {})
+        return web.json_response({
+            "order": {
+                "id": order_id,
+                "delivery_option_raw_id": (order.get("delivery_option") or {}).get("id"),
+                "cartTotalPriceInDefaultCurrency": 100.0,
+            }
+        })
+
+    async def np_init_data_order(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "data": {
+                "payerType": "Recipient",
+                "warehouseName": "Відділення №1",
+                "warehouseDocId": "1",
+                "warehouse": "warehouse-ref",
+                "cityDocId": "1",
+                "city": "city-ref",
+                "cityName": "Київ",
+                "serviceType": "WarehouseWarehouse",
+                "firstName": "Тест",
+                "lastName": "Клієнт",
+                "phone": "+380000000000",
+                "description": "Товар",
+                "warehouseFrom": "sender-warehouse-ref",
+                "boxItems": [],
+                "isRedelivery": True,
+                "ownerId": OWNER_ID,
+            }
+        })
+
+    async def np_delivery_info(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({
+            "status": "ok",
+            "fields": {
+                "declaration_id": body["order_id"],
+                "int_doc_number": f"2045{body['order_id']:010d}",
+                "delivery_cost": 70,
+            },
+        })
+
+    async def empty_init_data_order(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": {}})
+
+    async def meest_init_data_order(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "data": {
+                "orderData": {
+                    "firstName": "Тест",
+                    "lastName": "Клієнт",
+                    "phone": "+380000000000",
+                    "cityRef": "city-ref",
+                    "cityName": "Київ",
+                    "cityDocId": "1",
+                    "deliveryType": "branch",
+                    "branchRef": "branch-ref",
+                    "branchName": "Відділення №1",
+                    "warehouseDocId": "1",
+                    "places": [],
+                },
+                "delivery_options": [{"value": "1"}],
+            }
+        })
+
+    async def declaration(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        return web.json_response({
+            "declarationId": f"UA{body['order_id']:010d}",
+            "declarationRef": f"MEEST{body['order_id']:010d}",
+            "deliveryCost": 60,
+        })
+
+    # Signal REST API
+
+    async def signal_health(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def signal_send(self, request: web.Request) -> web.Response:
+        self.messages.append(await request.json())
+        return web.json_response({"timestamp": "0"}, status=201)
@@ -0,0 +1,57 @@
+"""Compare JSON backends on orders/list and products/list payloads.
+
+    python -m benchmarks.json_codec --records 100 --records 10000
+"""
+
+import argparse
+import importlib
+import json
+import time
+
+from benchmarks.fake_prom import synthetic_orders, synthetic_products
+from src import codec
+
+
+def best_of(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, action="append")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = []
+    for name in codec.BACKENDS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        backends.append(name)
+
+    print(f"{'payload':>9} {'records':>8} {'MB':>6} {'backend':>8} {'loads ms':>9} {'dumps ms':>9}")
+    for records in args.records or [100, 10000]:
+        payloads = {
+            "orders": {"orders": synthetic_orders(records)},
+            "products": {"products": synthetic_products(records)},
+        }
+        for name, payload in payloads.items():
+            text = json.dumps(payload)
+            for backend in backends:
+                codec.use(backend)
+                loads = best_of(lambda: codec.loads(text), args.repeat)
+                dumps = best_of(lambda: codec.dumps(payload), args.repeat)
+                print(
+                    f"{name:>9} {records:>8} {len(text) / 2 ** 20:>6.2f} {backend:>8} "
+                    f"{loads * 1000:>9.2f} {dumps * 1000:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
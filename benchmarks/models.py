@@ -0,0 +1,57 @@
+"""Memory held by decoded models, as measured by tracemalloc.
+
+Records are decoded from a JSON payload, as they come from the API, so
+strings kept by the models are counted too.
+
+    python -m benchmarks.models --products 100000 --orders 5000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.fake_prom import synthetic_orders, synthetic_products
+from src import codec
+from src.models.decoders import decoder
+from src.models.order import Order
+from src.models.product import Product
+
+
+def measure(cls: type, records: list[dict]) -> tuple[int, float]:
+    """Bytes retained by the decoded instances and the decoding time."""
+    decode = decoder(cls)
+    payload = codec.dumps(records)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    instances = [decode(record) for record in codec.loads(payload)]
+    elapsed = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--orders", type=int, default=5000)
+    args = parser.parse_args()
+
+    datasets = [
+        (Product, synthetic_products(args.products)),
+        (Order, synthetic_orders(args.orders)),
+    ]
+
+    print(f"{'model':>8} {'records':>8} {'MB':>8} {'B/record':>9} {'decode s':>9}")
+    for cls, records in datasets:
+        retained, elapsed = measure(cls, records)
+        print(
+            f"{cls.__name__:>8} {len(records):>8} {retained / 2**20:>8.1f} "
+            f"{retained / len(records):>9.0f} {elapsed:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""End-to-end benchmark of AllBuyBot.refresh_shop against a local fake Prom.
+
+    python -m benchmarks.refresh_shop --orders 1000 --orders 10000 --latency 0.02
+
+Record a run once and replay it deterministically:
+
+    python -m benchmarks.refresh_shop --orders 1000 --cassette run.json.gz --record
+    python -m benchmarks.refresh_shop --orders 1000 --cassette run.json.gz
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import io
+import logging
+import statistics
+import time
+
+from benchmarks.cassette import CassetteServer
+from benchmarks.fake_prom import FakeProm, fake_cookies, synthetic_orders
+from src.allbuy_bot import AllBuyBot
+from src.prom.client import PromAPIClient
+from src.sessions import SessionFactory
+from src.signal.bot import SignalBot
+
+
+def percentile(samples: list[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[int(q) - 1]
+
+
+async def run(
+    orders: int,
+    latency: float,
+    error_rate: float,
+    concurrency: int,
+    known: bool,
+    prom_rate: float = 1000,
+    seed: int = 0,
+    cassette: str | None = None,
+    record: bool = False,
+) -> dict:
+    # With a cassette the fake only serves Signal in replay mode, and is
+    # the recorded upstream in record mode.
+    replay = bool(cassette) and not record
+    fake = FakeProm(
+        orders=synthetic_orders(orders, seed=seed),
+        latency=0.0 if replay else latency,
+        error_rate=error_rate,
+        seed=seed,
+    )
+    url = await fake.start()
+
+    proxy = None
+    prom_url = url
+    if cassette:
+        proxy = CassetteServer(
+            cassette,
+            mode="record" if record else "replay",
+            upstream=url,
+            latency=latency,
+        )
+        prom_url = await proxy.start()
+
+    session_factory = SessionFactory()
+    client = PromAPIClient(
+        "fake-token",
+        base_url=f"{prom_url}/api/v1/",
+        session_factory=session_factory,
+        requests_per_second=prom_rate,
+    )
+    messenger = SignalBot(
+        signal_service=url.removeprefix("http://"),
+        phone_number="+380000000000",
+        group_id="group",
+        session_factory=session_factory,
+    )
+    bot = AllBuyBot(
+        client=client,
+        messenger=messenger,
+        cookies=fake_cookies(),
+        concurrency=concurrency,
+        scraper_base_url=f"{prom_url}/",
+        session_factory=session_factory,
+    )
+
+    if known:
+        # Pretend every PAID/PENDING order was seen by a previous run, so
+        # only the cancellation hook runs and no declarations are created.
+        bot.paid_orders = {
+            str(order["id"]): {"ts": 0}
+            for order in fake.orders.values() if order["status"] == "paid"
+        }
+        bot.pending_orders = {
+            str(order["id"]): {"ts": 0}
+            for order in fake.orders.values() if order["status"] == "pending"
+        }
+
+    # Known orders are checked by manager in batches, and safe_refresh_order
+    # only records their results, so every order of a batch is charged
+    # with the time of its cancellation_hooks call instead.
+    latencies = []
+    batched = contextvars.ContextVar("batched", default=False)
+    safe_refresh_order = bot.safe_refresh_order
+    refresh_known_orders = bot.refresh_known_orders
+    assign = bot.director.assign
+
+    async def timed_refresh_order(order, initial=False, result=None):
+        if result is not None:
+            return await safe_refresh_order(order, initial=initial, result=result)
+        start = time.perf_counter()
+        try:
+            return await safe_refresh_order(order, initial=initial)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    async def batched_refresh_known_orders(orders):
+        token = batched.set(True)
+        try:
+            return await refresh_known_orders(orders)
+        finally:
+            batched.reset(token)
+
+    def timed_assign(order):
+        manager = assign(order)
+        if "cancellation_hooks" not in vars(manager):
+            cancellation_hooks = manager.cancellation_hooks
+
+            async def timed_cancellation_hooks(orders, now=None):
+                if not batched.get():
+                    return await cancellation_hooks(orders, now=now)
+                start = time.perf_counter()
+                try:
+                    return await cancellation_hooks(orders, now=now)
+                finally:
+                    latencies.extend([time.perf_counter() - start] * len(orders))
+
+            manager.cancellation_hooks = timed_cancellation_hooks
+        return manager
+
+    bot.safe_refresh_order = timed_refresh_order
+    bot.refresh_known_orders = batched_refresh_known_orders
+    bot.director.assign = timed_assign
+
+    start = time.perf_counter()
+    try:
+        await bot.refresh_shop(orders=None)
+    finally:
+        elapsed = time.perf_counter() - start
+        await session_factory.close()
+        if proxy:
+            await proxy.stop()
+        await fake.stop()
+
+    requests = proxy.requests if proxy else fake.requests
+    return {
+        "orders": orders,
+        "processed": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "requests": sum(requests.values()),
+        "messages": len(fake.messages),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, action="append")
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake server latency, s")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--prom-rate", type=float, default=1000, help="PromAPIClient requests per second",
+    )
+    parser.add_argument(
+        "--known", action="store_true",
+        help="Treat PAID/PENDING orders as already known (steady-state run)",
+    )
+    parser.add_argument(
+        "--cassette", help="Replay the Prom side from this cassette (see benchmarks.cassette)",
+    )
+    parser.add_argument(
+        "--record", action="store_true",
+        help="Record the fake Prom into --cassette instead of replaying it",
+    )
+    args = parser.parse_args()
+    if args.record and not args.cassette:
+        parser.error("--record needs --cassette")
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(
+        f"{'orders':>7} {'processed':>9} {'seconds':>8} {'orders/s':>9} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'requests':>8} {'messages':>8}"
+    )
+    for orders in args.orders or [1000, 10000]:
+        # SignalBot prints every delivery; keep the report readable.
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run(
+                orders=orders,
+                latency=args.latency,
+                error_rate=args.error_rate,
+                concurrency=args.concurrency,
+                known=args.known,
+                prom_rate=args.prom_rate,
+                cassette=args.cassette,
+                record=args.record,
+            ))
+        print(
+            f"{result['orders']:>7} {result['processed']:>9} {result['seconds']:>8.2f} "
+            f"{result['throughput']:>9.1f} {result['p50'] * 1000:>8.1f} "
+            f"{result['p99'] * 1000:>8.1f} {result['requests']:>8} {result['messages']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
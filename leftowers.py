@@ -2,6 +2,7 @@ import argparse
 import asyncio
 import datetime
 import io
+import logging
 import os
 from dataclasses import replace
 
@@ -10,10 +11,14 @@ import gspread
 from dotenv import load_dotenv
 from google.cloud import secretmanager_v1
 
+from src.executor import _aiter
+from src.prom.cache import ResponseCache
 from src.prom.client import PromAPIClient
 from src.stock.intertool_manager import IntertoolManager
 from src.stock.stock_manager import StockManager
 
+logger = logging.getLogger(__name__)
+
 scope = [
     "https://spreadsheets.google.com/feeds",
     "https://www.googleapis.com/auth/drive",
@@ -26,46 +31,53 @@ def normalize_sku(sku: str | None) -> str | None:
     return sku.strip() if sku else sku
 
 
-def plan_updates(prom_products, stock_products, intertool_products):
-    """Decide presence for every prom product.
+class UpdatePlanner:
+    """Decides presence for prom products one at a time, so the prom
+    catalog can be streamed instead of loaded whole.
 
     A product counts as available iff its quantity on the owner's stock
     sheet is > 0 OR the intertool feed marks it available — the sheet is
     authoritative for items intertool has delisted from its b2c feed.
-
-    Returns (update_products, unknown_products) where update_products is
-    a list of (old_product, new_product) pairs.
     """
-    i_products = {normalize_sku(p.sku): p for p in intertool_products}
 
-    known_skus = {normalize_sku(p.sku) for p in stock_products}
-    known_skus |= {normalize_sku(p.sku) for p in intertool_products}
+    def __init__(self, stock_products, intertool_products):
+        self.i_products = {normalize_sku(p.sku): p for p in intertool_products}
 
-    available_skus = {
-        normalize_sku(p.sku) for p in stock_products if p.quantity_in_stock > 0
-    }
-    available_skus |= {
-        normalize_sku(p.sku) for p in intertool_products if p.in_stock
-    }
+        self.known_skus = {normalize_sku(p.sku) for p in stock_products}
+        self.known_skus |= {normalize_sku(p.sku) for p in intertool_products}
 
-    update_products = []
-    unknown_products = []
+        self.available_skus = {
+            normalize_sku(p.sku) for p in stock_products if p.quantity_in_stock > 0
+        }
+        self.available_skus |= {
+            normalize_sku(p.sku) for p in intertool_products if p.in_stock
+        }
 
-    for prom_product in prom_products:
+        # Only products that need attention are kept.
+        self.update_products = []
+        self.unknown_products = []
+
+    def add(self, prom_product):
+        if not self.is_known(prom_product):
+            self.unknown_products.append(prom_product)
+        elif product := self.plan(prom_product):
+            self.update_products.append((prom_product, product))
+
+    def is_known(self, prom_product) -> bool:
+        return normalize_sku(prom_product.sku) in self.known_skus
+
+    def plan(self, prom_product):
+        """Updated product, or None if the prom product should stay as-is."""
         product = prom_product
         sku = normalize_sku(product.sku)
 
-        if sku not in known_skus:
-            unknown_products.append(product)
-            continue
-
-        if intertool_product := i_products.get(sku):
+        if intertool_product := self.i_products.get(sku):
             # Kept as-is pending the owner's answer on whether the prom
             # price should be raised to a higher intertool price.
             if intertool_product.price >= product.price:
                 product = replace(product, price=intertool_product.price)
 
-        if sku in available_skus:
+        if sku in self.available_skus:
             if product.presence == "not_available":
                 product = replace(product, presence="available", in_stock=True)
         else:
@@ -74,17 +86,43 @@ def plan_updates(prom_products, stock_products, intertool_products):
 
         if product is not prom_product:
             if not (product.presence == prom_product.presence == "not_available"):
-                update_products.append((prom_product, product))
+                return product
+        return None
 
-    return update_products, unknown_products
+
+def plan_updates(prom_products, stock_products, intertool_products):
+    """Decide presence for every prom product.
+
+    Returns (update_products, unknown_products) where update_products is
+    a list of (old_product, new_product) pairs.
+    """
+    planner = UpdatePlanner(stock_products, intertool_products)
+    for prom_product in prom_products:
+        planner.add(prom_product)
+    return planner.update_products, planner.unknown_products
+
+
+async def stream_updates(prom_products, stock_products, intertool_products):
+    """plan_updates over an async stream of the prom catalog."""
+    planner = UpdatePlanner(stock_products, intertool_products)
+    async for prom_product in _aiter(prom_products):
+        planner.add(prom_product)
+    return planner.update_products, planner.unknown_products
 
 
 async def main(args):
     creds, project_id = google.auth.default(scopes=scope)
     gspread_client = gspread.client.Client(creds)
 
-    prom_client = PromAPIClient(args.prom_token)
-    prom_products = await prom_client.get_products()
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(
+            args.cache_dir,
+            ttl=args.cache_ttl,
+            max_bytes=args.cache_size * 2 ** 20,
+            bypass=args.no_cache,
+        )
+    prom_client = PromAPIClient(args.prom_token, cache=cache)
 
     stock_manager = StockManager(
         client=gspread_client,
@@ -96,8 +134,10 @@ async def main(args):
     intertool_manager = IntertoolManager()
     intertool_products = intertool_manager.get_products(from_file=False)
 
-    update_products, unknown_products = plan_updates(
-        prom_products, stock_products, intertool_products
+    update_products, unknown_products = await stream_updates(
+        prom_client.iter_products(max_pages=args.max_pages),
+        stock_products,
+        intertool_products,
     )
 
     spreadsheet = gspread_client.open("Склад Intertool")
@@ -140,7 +180,16 @@ async def main(args):
                 ]
             )
         updated.append_rows(res)
-        # await prom_client.edit_products([p for (_, p) in update_products])
+
+        if args.apply:
+            report = await prom_client.edit_products(
+                [p for (_, p) in update_products],
+                chunk_size=args.chunk_size,
+                concurrency=args.edit_concurrency,
+            )
+            logger.info("Prom products: %s", report)
+            for product_id, error in report.errors.items():
+                logger.error("Failed to update product %s: %s", product_id, error)
 
     unknown = spreadsheet.worksheet("Невідомі")
     unknown.clear()
@@ -163,6 +212,11 @@ async def main(args):
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
     params = {}
     if not os.path.exists("local.env"):
         secret_client = secretmanager_v1.SecretManagerServiceClient()
@@ -181,5 +235,45 @@ if __name__ == "__main__":
         "--prom-token", help="Prom API token", default=os.getenv("PROM_TOKEN")
     )
 
+    parser.add_argument(
+        "--max-pages", help="Prom catalog pages to buffer ahead while streaming",
+        type=int, default=int(os.getenv("MAX_PAGES", "2"))
+    )
+
+    parser.add_argument(
+        "--cache-dir", help="Cache Prom catalog pages in this directory",
+        default=os.getenv("PROM_CACHE_DIR")
+    )
+
+    parser.add_argument(
+        "--cache-ttl", help="Seconds a cached catalog page stays valid",
+        type=float, default=float(os.getenv("PROM_CACHE_TTL", "3600"))
+    )
+
+    parser.add_argument(
+        "--cache-size", help="Maximum size of the catalog cache, MB",
+        type=int, default=int(os.getenv("PROM_CACHE_SIZE", "100"))
+    )
+
+    parser.add_argument(
+        "--no-cache", help="Ignore cached catalog pages (they are still refreshed)",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--apply", help="Push the planned updates to Prom (otherwise only report them)",
+        action="store_true"
+    )
+
+    parser.add_argument(
+        "--chunk-size", help="Products per products/edit request",
+        type=int, default=int(os.getenv("EDIT_CHUNK_SIZE", "100"))
+    )
+
+    parser.add_argument(
+        "--edit-concurrency", help="products/edit requests in flight at once",
+        type=int, default=int(os.getenv("EDIT_CONCURRENCY", "4"))
+    )
+
     args = parser.parse_args()
     asyncio.run(main(args))
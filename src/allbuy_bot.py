@@ -1,22 +1,71 @@
+import asyncio
 import datetime
+import hashlib
 import logging
+import time
+from collections.abc import AsyncIterable
 
 from dataclasses import asdict
 import flatdict
 
 import src.exceptions as e
+from src import metrics
+from src.executor import OrderExecutor, Prefetch
+from src.models.utils import state_dict
+from src.models.delivery_provider import DeliveryProviders
 from src.models.order import Order
-from src.models.order_status import OrderStatuses
+from src.models.order_status import OrderStatus, OrderStatuses
 
 from src.prom.client import PromAPIClient
-from src.prom.exceptions import GeneratingDeclarationException, NotAllowedWarehouseException
-from src.prom.managers.director import Director, DummyManager
+from src.prom.exceptions import (
+    GeneratingDeclarationException,
+    NotAllowedWarehouseException,
+    OutdatedCookiesError,
+    ScraperUnavailableError,
+)
+from src.prom.managers.director import Director
+from src.prom.managers.dummy import DummyManager
+from src.retry_queue import RetryQueue
+from src.sessions import SessionFactory
 from src.signal.bot import SignalBot
 
 
 logger = logging.getLogger(__name__)
 
 
+# Order fields the managers base their decisions on. An order whose values
+# (and age bracket) did not change since the last run gets the same outcome.
+FINGERPRINT_FIELDS = (
+    "status.name",
+    "payment_option.id",
+    "payment_data.status.name",
+    "delivery_option.id",
+    "delivery_provider_data.unified_status",
+)
+
+
+def fingerprint(order_data: flatdict.FlatDict, age: datetime.timedelta) -> str:
+    values = []
+    for field in FINGERPRINT_FIELDS:
+        try:
+            values.append(order_data.get(field))
+        except TypeError:
+            values.append(None)
+
+    values.append(age > DummyManager.CANCELLATION_AGE)
+    values.append(age > DummyManager.OUTDATED_AGE)
+
+    return hashlib.sha1("|".join(map(str, values)).encode("utf-8")).hexdigest()
+
+
+def provider_label(order: Order) -> str:
+    if not order.delivery_option:
+        return ""
+    if provider := DeliveryProviders.get_by_id(order.delivery_option.id):
+        return provider.value.type
+    return str(order.delivery_option.id)
+
+
 class AllBuyBot:
 
     def __init__(
@@ -27,6 +76,12 @@ class AllBuyBot:
         paid_orders: dict | None = None,
         pending_orders: dict | None = None,
         admin_phone: str | None = None,
+        concurrency: int = 1,
+        provider_concurrency: dict[int | None, int] | None = None,
+        full_sweep_interval: datetime.timedelta | None = None,
+        scraper_base_url: str = "https://my.prom.ua/",
+        session_factory: SessionFactory | None = None,
+        retry_queue: RetryQueue | None = None,
     ):
         self.client = client
         self.orders = []
@@ -36,95 +91,359 @@ class AllBuyBot:
             api_client=self.client,
             messenger=self.messenger,
             cookies=cookies,
+            scraper_base_url=scraper_base_url,
+            session_factory=session_factory,
         )
         self.paid_orders = paid_orders or dict()
         self.pending_orders = pending_orders or dict()
         self.retry_orders = set()
+        self.retry_queue = RetryQueue() if retry_queue is None else retry_queue
+        self.outcomes = {}
+        self.cookies_outdated = False
         self.admin_phone = admin_phone
+        self.executor = OrderExecutor(
+            concurrency=concurrency,
+            provider_concurrency=provider_concurrency,
+        )
+        self.full_sweep_interval = full_sweep_interval
+
+    def modified_from(self, tracked_orders: dict) -> str | None:
+        """High-water mark for an incremental refresh of tracked orders.
+
+        The mark is the newest ``date_modified`` among the persisted orders.
+        Every order gets a fresh ``ts`` when it is processed, so the oldest
+        ``ts`` tells when all of them were last swept. Returns None when a
+        full sweep is due.
+        """
+        if self.full_sweep_interval is None or not tracked_orders:
+            return None
+
+        try:
+            last_sweep = min(float(o["ts"]) for o in tracked_orders.values())
+            watermark = max(
+                datetime.datetime.fromisoformat(o["date_modified"]).replace(tzinfo=None)
+                for o in tracked_orders.values()
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        since_sweep = datetime.datetime.now().timestamp() - last_sweep
+        if since_sweep > self.full_sweep_interval.total_seconds():
+            return None
+
+        return watermark.strftime("%Y-%m-%dT%H:%M:%S")
 
     async def refresh_shop(self, orders: list[str]):
         logger.info("Refreshing shop data")
         input_orders = orders or []
+        # Outcomes are only read back within a run.
+        self.outcomes = {}
+
+        # Outdated cookies only stop declarations; status changes and
+        # cancellations go through the API and still run.
+        self.cookies_outdated = not await self.director.preflight()
+        if self.cookies_outdated:
+            logger.warning("Cookies are outdated, declarations are skipped in this run")
+
+        tracked = {
+            OrderStatuses.PAID.value: self.paid_orders,
+            OrderStatuses.PENDING.value: self.pending_orders,
+        }
+        modified_from = {
+            status: None if input_orders else self.modified_from(tracked_orders)
+            for status, tracked_orders in tracked.items()
+        }
+        for status, watermark in modified_from.items():
+            if watermark:
+                logger.info("Refreshing %s orders modified since %s", status.name, watermark)
+            else:
+                logger.info("Refreshing all %s orders", status.name)
 
-        # processing = True
-        date_to = None
-        # while processing:
-        orders = await self.client.get_orders(status=OrderStatuses.RECEIVED.value, date_to=date_to)
+        # All three lists are streamed from the start of the run so that
+        # the PAID and PENDING pages arrive while RECEIVED orders are
+        # still being processed; each buffer holds at most one page.
+        fetches = {
+            OrderStatuses.RECEIVED.value: Prefetch(
+                self.client.iter_orders(status=OrderStatuses.RECEIVED.value), maxsize=100,
+            ),
+        }
+        for status, watermark in modified_from.items():
+            fetches[status] = Prefetch(
+                self.client.iter_orders(status=status, last_modified_from=watermark),
+                maxsize=100,
+            )
 
-            # if not orders:
-            #     processing = False
-            #     break
+        known_received = []
 
-        for order in orders:
-            initial = False
-            if input_orders: 
-                if str(order.id) not in input_orders:
-                    continue
-                else:
-                    initial = True
-            # date_to = order.datetime_created.strftime("%Y-%m-%dT%H:%M:%S")
-            await self.safe_refresh_order(order, initial=initial)
+        async def refresh_received(order: Order):
+            if input_orders and str(order.id) not in input_orders:
+                return
+            if not input_orders:
+                known_received.append(order)
+                return
+            await self.safe_refresh_order(order, initial=True)
 
-        orders = await self.client.get_orders(status=OrderStatuses.PAID.value)
-        processed_paid_orders = {}
-        self.retry_orders = set()
-        for order in orders:
-            initial = str(order.id) not in self.paid_orders
+        try:
+            await self.executor.map(fetches[OrderStatuses.RECEIVED.value], refresh_received)
+            await self.refresh_known_orders(known_received)
 
-            if input_orders: 
-                if str(order.id) not in input_orders:
-                    continue
-                else:
-                    initial = True
+            self.paid_orders = await self.refresh_tracked_orders(
+                fetches[OrderStatuses.PAID.value], self.paid_orders, input_orders,
+                incremental=bool(modified_from[OrderStatuses.PAID.value]),
+                status=OrderStatuses.PAID.value,
+            )
 
-            processed_paid_orders[str(order.id)] = flatdict.FlatDict(asdict(order), delimiter=".")
+            self.pending_orders = await self.refresh_tracked_orders(
+                fetches[OrderStatuses.PENDING.value], self.pending_orders, input_orders,
+                incremental=bool(modified_from[OrderStatuses.PENDING.value]),
+                status=OrderStatuses.PENDING.value,
+            )
+        finally:
+            for fetch in fetches.values():
+                fetch.cancel()
 
-            if not initial:
-                processed_paid_orders[str(order.id)]["ts"] = self.paid_orders[str(order.id)]["ts"]
+        if watermarks := [watermark for watermark in modified_from.values() if watermark]:
+            await self.prune_tracked_orders(min(watermarks))
 
-            order = await self.safe_refresh_order(order, initial=initial)
-            if o := processed_paid_orders[str(order.id)]:
-                o["ts"] = datetime.datetime.now().timestamp()
+        if not input_orders:
+            for order_id in list(self.retry_queue.entries):
+                if (
+                    self.retry_queue.is_dead(order_id) and
+                    order_id not in self.paid_orders and
+                    order_id not in self.pending_orders
+                ):
+                    logger.info("Order %s is no longer tracked, dropping its retry entry", order_id)
+                    self.retry_queue.remove(order_id)
+
+    async def prune_tracked_orders(self, modified_from: str):
+        """Drop the carried-over rows of orders that left PAID/PENDING.
 
-        self.paid_orders = {
-            k: v for k, v in processed_paid_orders.items()
-            if k not in self.retry_orders
+        A status change bumps ``date_modified``, so every such order is in
+        the list of orders modified since the watermark.
+        """
+        tracked = {
+            OrderStatuses.PAID.value: self.paid_orders,
+            OrderStatuses.PENDING.value: self.pending_orders,
         }
+        async for order in self.client.iter_orders(last_modified_from=modified_from):
+            for status, tracked_orders in tracked.items():
+                if order.status != status and tracked_orders.pop(str(order.id), None):
+                    logger.info("Order %s is %s now, no longer tracked", order.id, order.status)
 
-        processed_pending_orders = {}
+    async def refresh_tracked_orders(
+        self,
+        orders: AsyncIterable[Order],
+        tracked_orders: dict,
+        input_orders: list[str],
+        incremental: bool = False,
+        status: OrderStatus | None = None,
+    ) -> dict:
+        # An incremental refresh only sees orders modified since the last
+        # run, so everything else is carried over until the next full sweep.
+        processed_orders = dict(tracked_orders) if incremental else {}
         self.retry_orders = set()
-        orders = await self.client.get_orders(status=OrderStatuses.PENDING.value)
+        seen = set()
+        known = []
 
-        for order in orders:
-            initial = str(order.id) not in self.pending_orders
+        def track(order: Order):
+            if o := processed_orders[str(order.id)]:
+                o["ts"] = datetime.datetime.now().timestamp()
+                o["outcome"] = self.outcomes.get(str(order.id))
+
+        async def refresh(order: Order):
+            seen.add(str(order.id))
+            tracked_order = tracked_orders.get(str(order.id))
+            # Orders kept for a retry are handled as new ones again.
+            initial = not tracked_order or bool(tracked_order.get("retry"))
 
             if input_orders:
                 if str(order.id) not in input_orders:
-                    continue
+                    return
                 else:
                     initial = True
 
-            processed_pending_orders[str(order.id)] = (
-                flatdict.FlatDict(asdict(order), delimiter=".")
-            )
+            if (
+                initial and tracked_order and not input_orders and
+                self.retry_queue.is_waiting(order.id)
+            ):
+                # retry_due owns the timing of the next attempt.
+                logger.info("Order %s: its retry is not due yet", order.id)
+                processed_orders[str(order.id)] = tracked_order
+                self.retry_orders.add(str(order.id))
+                return
+
+            if initial and not input_orders and self.retry_queue.is_dead(order.id):
+                # No more declaration attempts, but the API-only rules
+                # still apply.
+                logger.info("Order %s: its declaration was given up on", order.id)
+                initial = False
+
+            order_data = self.order_state(order)
+            processed_orders[str(order.id)] = order_data
+
+            if not initial and tracked_order:
+                order_data["ts"] = tracked_order["ts"]
+
+                if (
+                    (outcome := tracked_order.get("outcome")) and
+                    tracked_order.get("fingerprint") == order_data["fingerprint"]
+                ):
+                    logger.info("Order %s is unchanged since the last run (%s)", order.id, outcome)
+                    order_data["outcome"] = outcome
+                    order_data["ts"] = datetime.datetime.now().timestamp()
+                    return
 
             if not initial:
-                processed_pending_orders[str(order.id)]["ts"] = (
-                    self.pending_orders[str(order.id)]["ts"]
-                )
+                known.append(order)
+                return
 
-            order = await self.safe_refresh_order(order, initial=initial)
-            if o := processed_pending_orders[str(order.id)]:
-                o["ts"] = datetime.datetime.now().timestamp()
+            track(await self.safe_refresh_order(order, initial=True))
 
-        self.pending_orders = {
-            k: v for k, v in processed_pending_orders.items()
-            if k not in self.retry_orders
-        }
+        await self.executor.map(orders, refresh)
+
+        if incremental:
+            # Orders kept for a retry may be older than the watermark, so
+            # they are fetched directly.
+            await self.executor.map(
+                await self.fetch_retry_orders(
+                    [
+                        k for k, v in tracked_orders.items()
+                        if v.get("retry") and k not in seen and not self.retry_queue.is_waiting(k)
+                    ],
+                    status, processed_orders,
+                ),
+                refresh,
+            )
+
+        for order in await self.refresh_known_orders(known):
+            track(order)
+
+        # Orders that need another attempt stay tracked, marked for a retry.
+        for order_id in self.retry_orders:
+            if o := processed_orders.get(order_id):
+                o["retry"] = True
+        return processed_orders
+
+    async def fetch_retry_orders(
+        self,
+        order_ids: list[str],
+        status: OrderStatus | None,
+        processed_orders: dict,
+    ) -> list[Order]:
+        orders = []
+        results = await asyncio.gather(
+            *(self.client.get_order(int(order_id)) for order_id in order_ids),
+            return_exceptions=True,
+        )
+        for order_id, order in zip(order_ids, results):
+            if isinstance(order, Exception):
+                logger.warning("Could not fetch order %s: %s", order_id, order)
+            elif order is None or (status is not None and order.status != status):
+                logger.info("Order %s is no longer %s", order_id, status)
+                processed_orders.pop(order_id, None)
+            else:
+                orders.append(order)
+        return orders
 
-    async def safe_refresh_order(self, order: Order, initial: bool = False) -> Order:
+    async def refresh_known_orders(self, orders: list[Order]) -> list[Order]:
+        """Refresh orders that were seen before, in one batch.
+
+        Managers only run the cancellation rules for known orders, so the
+        orders are grouped by manager and each group is evaluated against
+        one snapshot of now, with batched status changes.
+        """
+        now = datetime.datetime.now()
+        results = {}
+        groups = {}
+        for order in orders:
+            try:
+                manager = self.director.assign(order)
+            except e.DeliveryProviderNotAllowedError as exc:
+                results[order.id] = exc
+            else:
+                groups.setdefault(id(manager), (manager, []))[1].append(order)
+
+        for manager, group in groups.values():
+            logger.info("Checking %s known orders with %s", len(group), type(manager).__name__)
+            with metrics.timer("process_orders"):
+                hooked = await manager.cancellation_hooks(group, now=now)
+            results.update(zip((order.id for order in group), hooked))
+
+        return [
+            await self.safe_refresh_order(order, result=results[order.id])
+            for order in orders
+        ]
+
+    @staticmethod
+    def order_state(order: Order) -> flatdict.FlatDict:
+        order_data = flatdict.FlatDict(asdict(order, dict_factory=state_dict), delimiter=".")
+        order_data["fingerprint"] = fingerprint(order_data, order.age)
+        return order_data
+
+    async def retry_due(self, now: float | None = None) -> int:
+        """Retry the declarations that are due in the retry queue, without a
+        full refresh. Returns the number of orders retried."""
+        order_ids = self.retry_queue.due(now)
+        if not order_ids:
+            return 0
+        if not await self.director.preflight():
+            logger.warning("Cookies are outdated, declarations are not retried")
+            self.cookies_outdated = True
+            return 0
+
+        logger.info("Retrying declarations for orders %s", order_ids)
+        self.retry_orders = set()
+        self.outcomes = {}
+        orders = []
+        results = await asyncio.gather(
+            *(self.client.get_order(int(order_id)) for order_id in order_ids),
+            return_exceptions=True,
+        )
+        for order_id, order in zip(order_ids, results):
+            if isinstance(order, Exception):
+                logger.warning("Could not fetch order %s for a retry: %r", order_id, order)
+                self.retry_queue.reschedule(order_id, now)
+            elif order is None or order.status not in (
+                OrderStatuses.PAID.value, OrderStatuses.PENDING.value,
+            ):
+                logger.info("Order %s no longer needs a declaration", order_id)
+                self.retry_queue.remove(order_id)
+            else:
+                orders.append(order)
+
+        async def retry(order: Order):
+            tracked_orders = (
+                self.paid_orders if order.status == OrderStatuses.PAID.value
+                else self.pending_orders
+            )
+            order_data = self.order_state(order)
+            order = await self.safe_refresh_order(order, initial=True)
+            if str(order.id) not in self.retry_orders:
+                order_data["ts"] = datetime.datetime.now().timestamp()
+                order_data["outcome"] = self.outcomes.get(str(order.id))
+                tracked_orders[str(order.id)] = order_data
+
+        await self.executor.map(orders, retry)
+        return len(order_ids)
+
+    async def safe_refresh_order(
+        self,
+        order: Order,
+        initial: bool = False,
+        result: Order | Exception | None = None,
+    ) -> Order:
+        """Refresh the order and record the outcome. A ``result`` computed in
+        a batch is handled as if the manager had just returned or raised it."""
+        outcome = "ok"
+        retry = False
+        start = time.perf_counter()
         try:
-            order = await self.refresh_order(order, initial=initial)
+            if result is None:
+                order = await self.refresh_order(order, initial=initial)
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                order = result
         except (
             e.NotAllowedOrderStatusError,
             e.DeliveryProviderNotAllowedError,
@@ -132,31 +451,66 @@ class AllBuyBot:
             e.IncompletePaymentError,
             e.ReadyForDeliveryError,
         ) as exc:
+            outcome = type(exc).__name__
             logger.info("Sending message to the chat:\n%s", exc)
             if self.messenger and initial:
                 await self.messenger.send(str(exc))
         except e.DeliveryProviderError as exc:
+            outcome = type(exc).__name__
             logger.info("Sending message to the chat:\n%s", exc)
             if self.messenger and initial:
                 await self.messenger.send(str(exc), notify=[self.admin_phone])
-        except e.GenerationDeclarationError as exc:
+        except (e.GenerationDeclarationError, e.StatusNotUpdatedError) as exc:
+            outcome = type(exc).__name__
+            retry = True
             self.retry_orders.add(str(order.id))
+            # The chat hears about the first failure and the final one only.
+            first_failure = str(order.id) not in self.retry_queue
+            dead = self.retry_queue.add(str(order.id), outcome)
             logger.info("Sending message to the chat:\n%s", exc)
-            if self.messenger and initial:
-                await self.messenger.send(str(exc))
+            if self.messenger and initial and (first_failure or dead):
+                await self.messenger.send(
+                    str(exc), notify=[self.admin_phone] if dead else None,
+                )
         except e.ModifiedDateIsTooOldError as exc:
+            outcome = type(exc).__name__
             logger.info("Ignoring too old orders:\n%s", exc)
         except e.UnknownFinalizationError as exc:
+            outcome = type(exc).__name__
             logger.exception("Unknown finalization error:\n%s", exc)
+        except OutdatedCookiesError as exc:
+            # Kept for a retry, so the order is handled again once the
+            # cookies are updated.
+            outcome = type(exc).__name__
+            retry = True
+            self.cookies_outdated = True
+            self.retry_orders.add(str(order.id))
+            logger.info("Skipping order %s until the cookies are updated", order.id)
+        except ScraperUnavailableError as exc:
+            outcome = type(exc).__name__
+            retry = True
+            self.retry_orders.add(str(order.id))
+            logger.info("Skipping order %s until the Prom cabinet is reachable", order.id)
 
+        # A dead-lettered order stays in the queue until it is retried by
+        # hand or is no longer tracked.
+        if not retry and (initial or not self.retry_queue.is_dead(order.id)):
+            self.retry_queue.remove(str(order.id))
+        self.outcomes[str(order.id)] = outcome
+        provider = provider_label(order)
+        metrics.observe("order", time.perf_counter() - start, provider=provider, outcome=outcome)
+        metrics.inc(provider=provider, outcome=outcome)
         return order
 
     async def refresh_order(self, order: Order, initial: bool = False) -> Order:
         logger.info("Refreshing order %s", order)
 
-        manager = self.director.assign(order)
+        provider = provider_label(order)
+        with metrics.timer("assign", provider=provider):
+            manager = self.director.assign(order)
         try:
-            order = await manager.process_order(order, initial=initial)
+            with metrics.timer("process_order", provider=provider):
+                order = await manager.process_order(order, initial=initial)
         except GeneratingDeclarationException as exc:
             logger.exception("Error while generating declaration for order")
             raise e.GenerationDeclarationError(order) from exc
@@ -0,0 +1,54 @@
+"""JSON codec used for every HTTP request body and response.
+
+The fastest available backend is picked on import (orjson, then ujson,
+then the standard library) and can be switched with ``use(name)`` or the
+``JSON_BACKEND`` environment variable.
+"""
+
+import importlib
+import json
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("orjson", "ujson", "json")
+
+backend = None
+_loads = json.loads
+_dumps = json.dumps
+
+
+def _orjson_dumps(module):
+    return lambda obj: module.dumps(obj).decode("utf-8")
+
+
+def use(name: str):
+    global backend, _loads, _dumps
+
+    module = importlib.import_module(name)
+    _loads = module.loads
+    _dumps = _orjson_dumps(module) if name == "orjson" else module.dumps
+    backend = name
+
+
+def loads(data: str | bytes):
+    return _loads(data)
+
+
+def dumps(obj) -> str:
+    return _dumps(obj)
+
+
+def _select():
+    preferred = os.getenv("JSON_BACKEND")
+    for name in ((preferred,) if preferred else ()) + BACKENDS:
+        try:
+            use(name)
+            return
+        except ImportError:
+            logger.debug("JSON backend %s is not available", name)
+
+
+_select()
@@ -51,6 +51,10 @@ class UnknownFinalizationError(NotAllowedOrderError):
     reason = "Невідомий алгоритм завершення замовлення"
 
 
+class StatusNotUpdatedError(NotAllowedOrderError):
+    reason = "Prom не оновив статус замовлення"
+
+
 class GenerationDeclarationError(Exception):
     def __init__(self, order: Order):
         self.order = order
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from typing import Any
+
+from src.models.order import Order
+
+
+logger = logging.getLogger(__name__)
+
+
+class OrderExecutor:
+    """Runs a coroutine for every order with a global concurrency limit
+    and optional per-delivery-provider limits (keyed by provider id).
+
+    With ``concurrency=1`` orders are processed strictly one by one, in
+    the order they were produced.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        provider_concurrency: dict[int | None, int] | None = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.provider_concurrency = provider_concurrency or {}
+        self._provider_semaphores = {}
+
+    def provider_semaphore(self, order: Order) -> asyncio.Semaphore | None:
+        provider_id = order.delivery_option.id if order.delivery_option else None
+        limit = self.provider_concurrency.get(provider_id)
+        if limit is None:
+            return None
+        if provider_id not in self._provider_semaphores:
+            self._provider_semaphores[provider_id] = asyncio.Semaphore(max(1, limit))
+        return self._provider_semaphores[provider_id]
+
+    async def map(
+        self,
+        orders: Iterable[Order] | AsyncIterable[Order],
+        func: Callable[[Order], Awaitable[Any]],
+    ) -> list:
+        slots = asyncio.Semaphore(self.concurrency)
+        failures = []
+        tasks = []
+
+        async def run(order: Order):
+            try:
+                semaphore = self.provider_semaphore(order)
+                if semaphore is None:
+                    return await func(order)
+                async with semaphore:
+                    return await func(order)
+            except BaseException as exc:
+                failures.append(exc)
+                raise
+            finally:
+                slots.release()
+
+        try:
+            async for order in _aiter(orders):
+                # Acquiring before spawning keeps at most ``concurrency``
+                # orders in flight and applies backpressure to the source.
+                await slots.acquire()
+                if failures:
+                    slots.release()
+                    break
+                tasks.append(asyncio.create_task(run(order)))
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def _aiter(items: Iterable | AsyncIterable):
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+class Prefetch:
+    """Starts draining an async iterable immediately, buffering up to
+    ``maxsize`` items until the consumer gets to it."""
+
+    _DONE = object()
+
+    def __init__(self, source: AsyncIterable, maxsize: int = 0):
+        self._queue = asyncio.Queue(maxsize)
+        self._task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterable):
+        try:
+            async for item in source:
+                await self._queue.put((item, None))
+        except Exception as exc:
+            await self._queue.put((self._DONE, exc))
+        else:
+            await self._queue.put((self._DONE, None))
+
+    async def __aiter__(self):
+        while True:
+            item, exc = await self._queue.get()
+            if item is self._DONE:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+
+    def cancel(self):
+        self._task.cancel()
@@ -0,0 +1,121 @@
+import bisect
+import contextlib
+import logging
+import os
+import tempfile
+import time
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _labels(labels: dict) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+class Registry:
+    """Minimal in-process metrics registry rendered in the Prometheus
+    text exposition format.
+
+    Durations are recorded in ``allbuy_stage_duration_seconds`` and counts
+    in ``allbuy_orders_total``; both are labelled by stage or provider and
+    by outcome (``ok`` or the exception class name).
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, stage: str, seconds: float, provider=None, outcome: str = "ok"):
+        key = (stage, provider or "", outcome)
+        if key not in self.histograms:
+            self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+        histogram = self.histograms[key]
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.buckets):
+            histogram[0][index] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def inc(self, provider=None, outcome: str = "ok", value: int = 1):
+        key = (provider or "", outcome)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, stage: str, provider=None):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException as exc:
+            outcome = type(exc).__name__
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, provider=provider, outcome=outcome)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP allbuy_stage_duration_seconds Time spent in a processing stage.",
+            "# TYPE allbuy_stage_duration_seconds histogram",
+        ]
+        for (stage, provider, outcome), (buckets, total, count) in sorted(self.histograms.items()):
+            labels = {"stage": stage, "provider": provider, "outcome": outcome}
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, buckets):
+                cumulative += bucket
+                lines.append(
+                    f"allbuy_stage_duration_seconds_bucket{{{_labels(labels | {'le': bound})}}} "
+                    f"{cumulative}"
+                )
+            lines.append(
+                f"allbuy_stage_duration_seconds_bucket{{{_labels(labels | {'le': '+Inf'})}}} {count}"
+            )
+            lines.append(f"allbuy_stage_duration_seconds_sum{{{_labels(labels)}}} {total}")
+            lines.append(f"allbuy_stage_duration_seconds_count{{{_labels(labels)}}} {count}")
+
+        lines += [
+            "# HELP allbuy_orders_total Orders processed by outcome.",
+            "# TYPE allbuy_orders_total counter",
+        ]
+        for (provider, outcome), value in sorted(self.counters.items()):
+            labels = {"provider": provider, "outcome": outcome}
+            lines.append(f"allbuy_orders_total{{{_labels(labels)}}} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        # Written atomically so the node exporter never reads a partial file.
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False, encoding="utf-8",
+        ) as file:
+            file.write(self.render())
+        os.replace(file.name, path)
+
+    async def serve(self, port: int, host: str = "0.0.0.0") -> web.AppRunner:
+        async def handle(request: web.Request) -> web.Response:
+            return web.Response(text=self.render(), content_type="text/plain")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Serving metrics on %s:%s/metrics", host, port)
+        return runner
+
+
+registry = Registry()
+
+observe = registry.observe
+inc = registry.inc
+timer = registry.timer
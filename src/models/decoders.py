@@ -0,0 +1,125 @@
+"""Decoders from API payloads to model dataclasses.
+
+A decoder is generated once per dataclass from its type hints, so decoding
+a record is a single function call with no reflection, unlike
+``dacite.from_dict``. Nested dataclasses get their own decoders and
+``TYPE_HOOKS`` convert API strings into the matching model instances.
+Records of the ``INTERNED`` types repeat across orders, so equal records
+decode to one shared instance.
+"""
+
+import dataclasses
+import functools
+import types
+import typing
+from collections.abc import Callable
+from typing import Any
+
+from src.models.delivery_provider import DeliveryProvider
+from src.models.order_status import OrderStatus, OrderStatuses
+from src.models.payment_option import PaymentOption
+from src.models.payment_status import PaymentStatus, PaymentStatuses
+
+
+TYPE_HOOKS = {
+    OrderStatus: lambda s: OrderStatuses.get(s).value,
+    PaymentStatus: lambda s: PaymentStatuses.get(s, PaymentStatuses.UNDEFINED).value,
+}
+
+# Frozen models only, as the instances are shared.
+INTERNED = (DeliveryProvider, PaymentOption)
+# Bound on the distinct records kept per interned type.
+INTERN_LIMIT = 1024
+
+PRIMITIVES = (str, int, float, bool, type(None), Any)
+
+
+def _interning(decode: Callable[[dict], Any]) -> Callable[[dict], Any]:
+    instances = {}
+
+    def intern(data: dict):
+        try:
+            key = tuple(data.items())
+            return instances[key]
+        except TypeError:
+            return decode(data)
+        except KeyError:
+            instance = decode(data)
+            if len(instances) < INTERN_LIMIT:
+                instances[key] = instance
+            return instance
+
+    return intern
+
+
+def _optional(type_) -> bool:
+    return (
+        typing.get_origin(type_) in (typing.Union, types.UnionType) and
+        type(None) in typing.get_args(type_)
+    )
+
+
+def _converter(type_) -> Callable | None:
+    """Function converting a non-None value of ``type_``, or None when the
+    value can be used as-is."""
+    if type_ in TYPE_HOOKS:
+        return TYPE_HOOKS[type_]
+    if type_ in INTERNED:
+        return _interning(decoder(type_))
+    if dataclasses.is_dataclass(type_):
+        return decoder(type_)
+    if type_ in PRIMITIVES:
+        return None
+
+    if typing.get_origin(type_) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(type_) if arg is not type(None)]
+        if len(args) == 1:
+            return _converter(args[0])
+        if all(arg in PRIMITIVES for arg in args):
+            return None
+
+    raise TypeError(f"Cannot build a decoder for {type_!r}")
+
+
+@functools.cache
+def decoder(cls: type) -> Callable[[dict], Any]:
+    """Decoder for the dataclass ``cls``, generated on first use."""
+    hints = typing.get_type_hints(cls)
+    namespace = {"cls": cls, "MISSING": dataclasses.MISSING}
+    lines = ["def decode(data):"]
+    arguments = []
+
+    for field in dataclasses.fields(cls):
+        if not field.init:
+            continue
+        name = field.name
+        value = f"v_{name}"
+
+        if field.default is not dataclasses.MISSING:
+            namespace[f"default_{name}"] = field.default
+            lines.append(f"    {value} = data.get({name!r}, default_{name})")
+        elif field.default_factory is not dataclasses.MISSING:
+            namespace[f"factory_{name}"] = field.default_factory
+            lines.append(f"    {value} = data.get({name!r}, MISSING)")
+            lines.append(f"    if {value} is MISSING:")
+            lines.append(f"        {value} = factory_{name}()")
+        elif _optional(hints[name]):
+            # dacite treats a missing Optional field as None.
+            lines.append(f"    {value} = data.get({name!r})")
+        else:
+            lines.append(f"    {value} = data[{name!r}]")
+
+        if convert := _converter(hints[name]):
+            namespace[f"convert_{name}"] = convert
+            lines.append(f"    if {value} is not None:")
+            lines.append(f"        {value} = convert_{name}({value})")
+
+        arguments.append(f"{name}={value}")
+
+    lines.append(f"    return cls({', '.join(arguments)})")
+    exec("\n".join(lines), namespace)
+    return namespace["decode"]
+
+
+def decode(cls: type, data: dict) -> Any:
+    return decoder(cls)(data)
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class DeliveryProvider:
     id: int
     name: str
@@ -60,3 +60,10 @@ class DeliveryProviders(Enum):
         name='Доставка "Justin"',
         comment=None,
     )
+
+    @classmethod
+    def get_by_id(cls, provider_id: int, default=None):
+        for provider in cls:
+            if provider.value.id == provider_id:
+                return provider
+        return default
@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from enum import Enum
 
 
-@dataclass
+@dataclass(slots=True)
 class DeliveryStatus:
     id: int | None
     name: str
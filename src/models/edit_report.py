@@ -0,0 +1,15 @@
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class EditReport:
+    processed_ids: list[int] = field(default_factory=list)
+    # Product id -> error from Prom, or the request failure for its chunk.
+    errors: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def __str__(self):
+        return f"{len(self.processed_ids)} updated, {len(self.errors)} failed"
@@ -2,6 +2,7 @@ import datetime
 from dataclasses import dataclass, field
 
 from src.models.client import Client
+from src.models.utils import parse_datetime
 from src.models.delivery_provider import DeliveryProvider
 from src.models.delivery_provider_data import DeliveryProviderData
 from src.models.order_status import OrderStatus
@@ -9,7 +10,7 @@ from src.models.payment_option import PaymentOption
 from src.models.payment_data import PaymentData
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Order:
     id: int
     status: OrderStatus
@@ -24,21 +25,22 @@ class Order:
     payment_data: PaymentData | None = None
     delivery_provider_data: DeliveryProviderData | None = None
     phone: str = field(repr=False, default="")
+    # Parsed once from the ISO strings above; not part of the order state.
+    _datetime_created: datetime.datetime | None = field(init=False, repr=False, compare=False)
+    _datetime_modified: datetime.datetime | None = field(init=False, repr=False, compare=False)
 
     def __post_init__(self, **kwargs):
         self.client.phone = self.phone
+        object.__setattr__(self, "_datetime_created", parse_datetime(self.date_created))
+        object.__setattr__(self, "_datetime_modified", parse_datetime(self.date_modified))
 
     @property
     def datetime_created(self) -> datetime.datetime | None:
-        if self.date_created is None:
-            return None
-        return datetime.datetime.fromisoformat(self.date_created).replace(tzinfo=None)
+        return self._datetime_created
 
     @property
     def datetime_modified(self) -> datetime.datetime | None:
-        if self.date_modified is None:
-            return None
-        return datetime.datetime.fromisoformat(self.date_modified).replace(tzinfo=None)
+        return self._datetime_modified
 
     @property
     def age(self) -> datetime.timedelta:
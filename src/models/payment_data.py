@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from src.models.payment_status import PaymentStatus
 
 
-@dataclass
+@dataclass(slots=True)
 class PaymentData:
     type: str | None
     status: PaymentStatus | None
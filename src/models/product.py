@@ -1,8 +1,11 @@
 import datetime
-from dataclasses import dataclass
+import sys
+from dataclasses import dataclass, field
 
+from src.models.utils import parse_datetime
 
-@dataclass
+
+@dataclass(slots=True)
 class Product:
     id: int | None = None
     sku: str | None = None
@@ -14,12 +17,26 @@ class Product:
     quantity_in_stock: int | None = None
     in_stock: bool | None = None
     date_modified: str | None = None
+    # Parsed from date_modified on first use (most products never need
+    # it); not part of the product state.
+    _datetime_modified: datetime.datetime | None = field(
+        init=False, repr=False, compare=False, default=None,
+    )
+
+    def __post_init__(self):
+        # The same few values repeat across the whole catalog.
+        if self.presence is not None:
+            self.presence = sys.intern(self.presence)
+        if self.currency is not None:
+            self.currency = sys.intern(self.currency)
+        if self.status is not None:
+            self.status = sys.intern(self.status)
 
     @property
     def datetime_modified(self) -> datetime.datetime | None:
-        if self.date_modified is None:
-            return None
-        return datetime.datetime.fromisoformat(self.date_modified).replace(tzinfo=None)
+        if self._datetime_modified is None:
+            self._datetime_modified = parse_datetime(self.date_modified)
+        return self._datetime_modified
 
     @property
     def url(self) -> str | None:
@@ -0,0 +1,13 @@
+import datetime
+
+
+def parse_datetime(value: str | None) -> datetime.datetime | None:
+    """Naive datetime from a Prom ISO timestamp."""
+    if value is None:
+        return None
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=None)
+
+
+def state_dict(items: list[tuple]) -> dict:
+    """``asdict`` factory leaving out private fields such as parsed caches."""
+    return {key: value for key, value in items if not key.startswith("_")}
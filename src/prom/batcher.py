@@ -0,0 +1,95 @@
+import asyncio
+import logging
+
+from src.models.order import Order
+from src.models.order_status import OrderStatus
+
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBatcher:
+    """Coalesces order status transitions into orders/set_status calls.
+
+    Transitions with the same target status and cancellation reason/text
+    that arrive within ``window`` seconds are sent as one request (split
+    into chunks of ``chunk_size`` ids). Each caller still gets its own
+    result: the response with ``processed_ids`` narrowed to its order.
+    """
+
+    def __init__(self, client, window: float = 0.05, chunk_size: int = 100):
+        self.client = client
+        self.window = window
+        self.chunk_size = chunk_size
+        self.pending = {}
+        self.statuses = {}
+        self.timers = {}
+        self.flushes = set()
+
+    async def set_order_status(
+        self,
+        order: Order,
+        status: OrderStatus,
+        cancellation_reason: str | None = None,
+        cancellation_text: str | None = None,
+    ) -> dict:
+        loop = asyncio.get_running_loop()
+        key = (status.name, cancellation_reason, cancellation_text)
+        future = loop.create_future()
+        self.statuses[key] = status
+        self.pending.setdefault(key, []).append((order, future))
+
+        if len(self.pending[key]) >= self.chunk_size:
+            self._schedule_flush(key)
+        elif key not in self.timers:
+            self.timers[key] = loop.call_later(self.window, self._schedule_flush, key)
+
+        return await future
+
+    def _schedule_flush(self, key):
+        task = asyncio.create_task(self._flush(key))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def _flush(self, key):
+        if timer := self.timers.pop(key, None):
+            timer.cancel()
+        batch = self.pending.pop(key, [])
+        if not batch:
+            return
+
+        # More callers than chunk_size may queue up before the flush runs.
+        await asyncio.gather(*(
+            self._send(key, batch[i:i + self.chunk_size])
+            for i in range(0, len(batch), self.chunk_size)
+        ))
+
+    async def _send(self, key, batch):
+        _, cancellation_reason, cancellation_text = key
+        try:
+            response = await self.client.set_orders_status(
+                [order for order, _ in batch],
+                self.statuses[key],
+                cancellation_reason=cancellation_reason,
+                cancellation_text=cancellation_text,
+            )
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        processed_ids = set(response.get("processed_ids") or [])
+        for order, future in batch:
+            if order.id not in processed_ids:
+                logger.warning("Order %s was not processed: %s", order.id, response)
+            if not future.done():
+                future.set_result(
+                    response | {"processed_ids": [order.id] if order.id in processed_ids else []}
+                )
+
+    async def flush(self):
+        for key in list(self.pending):
+            await self._flush(key)
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
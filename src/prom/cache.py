@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from src import codec
+
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """On-disk cache of decoded JSON responses for idempotent GETs.
+
+    Entries expire ``ttl`` seconds after they were stored. When the cache
+    grows beyond ``max_bytes`` the least recently used entries are evicted.
+    With ``bypass`` entries are never read but are still refreshed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = 3600,
+        max_bytes: int = 100 * 2 ** 20,
+        bypass: bool = False,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        # Running upper bound of the cache size; a directory scan only
+        # happens once it crosses max_bytes.
+        self.size = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(method: str, path: str, params: dict | None = None) -> str:
+        params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        return hashlib.sha256(codec.dumps([method, path, params]).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        if self.bypass:
+            return None
+
+        path = self.path(key)
+        try:
+            stored = os.stat(path).st_mtime
+            if time.time() - stored > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as file:
+                data = codec.loads(file.read())
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+
+        # The access time drives LRU eviction; the modification time keeps
+        # the moment the entry was stored.
+        os.utime(path, (time.time(), stored))
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: dict):
+        body = codec.dumps(data).encode("utf-8")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(body)
+        os.replace(tmp_path, self.path(key))
+
+        if self.size is not None:
+            self.size += len(body)
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        # Evict a little extra so a full cache is not rescanned on every set.
+        target = self.max_bytes if size <= self.max_bytes else self.max_bytes * 0.9
+        for _, entry_size, path in sorted(entries):
+            if size <= target:
+                break
+            logger.debug("Evicting cached response %s", path)
+            os.remove(path)
+            size -= entry_size
+        self.size = size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                os.remove(entry.path)
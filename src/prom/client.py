@@ -1,12 +1,21 @@
+import asyncio
 import logging
+from collections.abc import AsyncIterator
 
 import aiohttp
-import dacite
 
+from src import codec, metrics
+from src.executor import Prefetch
+from src.models.decoders import decoder
+from src.models.edit_report import EditReport
 from src.models.order import Order
-from src.models.order_status import OrderStatus, OrderStatuses
-from src.models.payment_status import PaymentStatus, PaymentStatuses
+from src.models.order_status import OrderStatus
 from src.models.product import Product
+from src.prom.batcher import StatusBatcher
+from src.prom.cache import ResponseCache
+from src.prom.exceptions import PromAPIError
+from src.prom.ratelimit import TokenBucket, backoff, retry_after
+from src.sessions import SessionFactory, new_session
 
 
 logger = logging.getLogger(__name__)
@@ -17,11 +26,28 @@ class PromAPIClient:
         self,
         token: str,
         base_url: str = "https://my.prom.ua/api/v1/",
+        session_factory: SessionFactory | None = None,
+        requests_per_second: float = 10,
+        max_retries: int = 5,
+        status_batch_window: float | None = None,
+        cache: ResponseCache | None = None,
     ):
         self.base_url = base_url
         self.token = token
+        self.max_retries = max_retries
+        self.cache = cache
+        # orders/* and products/* are throttled independently.
+        self.limiters = {
+            "orders": TokenBucket(requests_per_second),
+            "products": TokenBucket(requests_per_second),
+        }
+        # Without a window every status change is sent on its own.
+        self.status_batcher = None
+        if status_batch_window is not None:
+            self.status_batcher = StatusBatcher(self, window=status_batch_window)
 
-        self.client = aiohttp.ClientSession(
+        self.client = new_session(
+            session_factory,
             base_url=self.base_url,
             headers={
                 "Authorization": f"Bearer {self.token}",
@@ -33,77 +59,215 @@ class PromAPIClient:
     def order_url(cls, order_id: int):
         return f"https://my.prom.ua/cms/order/edit/{order_id}"
 
+    async def close(self):
+        if self.status_batcher:
+            await self.status_batcher.flush()
+        await self.client.close()
+
+    async def request(self, method: str, path: str, cache: bool = False, **kwargs) -> dict:
+        """Send a rate limited request, retrying throttling, server errors and
+        connection failures with jittered exponential backoff.
+
+        With ``cache`` the response is served from and stored in the response
+        cache, if the client has one. Only use it for idempotent GETs.
+        """
+        cache_key = None
+        if cache and self.cache is not None:
+            cache_key = ResponseCache.key(method, path, kwargs.get("params"))
+            if (cached := self.cache.get(cache_key)) is not None:
+                return cached
+
+        response_json = await self._request(method, path, **kwargs)
+        if cache_key is not None:
+            self.cache.set(cache_key, response_json)
+        return response_json
+
+    async def _request(self, method: str, path: str, **kwargs) -> dict:
+        limiter = self.limiters[path.split("/", 1)[0]]
+
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                async with self.client.request(method, path, **kwargs) as resp:
+                    if resp.status == 429 or resp.status >= 500:
+                        if resp.status == 429:
+                            limiter.throttled()
+                        error = PromAPIError(resp.status, await resp.text())
+                        delay = retry_after(resp.headers.get("Retry-After"))
+                    else:
+                        limiter.succeeded()
+                        return await resp.json(loads=codec.loads)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                error = exc
+                delay = None
+
+            if attempt == self.max_retries:
+                raise error
+
+            delay = backoff(attempt) if delay is None else delay
+            logger.warning(
+                "%s %s failed (%s), retrying in %.1f s", method, path, error, delay,
+            )
+            await asyncio.sleep(delay)
+
+    async def get_product_page(self, last_id: int | None = None, limit: int = 100) -> list[dict]:
+        params = {"limit": limit}
+        if last_id:
+            params["last_id"] = last_id
+
+        response_json = await self.request("GET", "products/list", params=params, cache=True)
+        return response_json.get("products") or []
+
+    async def iter_products(self, limit: int = 100, max_pages: int = 1) -> AsyncIterator[Product]:
+        """Stream the whole catalog page by page.
+
+        Pages are fetched in the background while the current one is decoded
+        and consumed. At most ``max_pages`` raw pages are buffered ahead of
+        the consumer, so memory does not grow with the size of the catalog.
+        """
+        async def pages():
+            last_id = None
+            while page := await self.get_product_page(last_id=last_id, limit=limit):
+                last_id = page[-1]["id"]
+                yield page
+
+        prefetch = Prefetch(pages(), maxsize=max_pages)
+        try:
+            decode_product = decoder(Product)
+            async for page in prefetch:
+                for product_data in page:
+                    yield decode_product(product_data)
+        finally:
+            prefetch.cancel()
+
     async def get_products(self) -> list[Product]:
-        products = []
-        has_more = True
-        while has_more:
-            params = {"limit": 100}
-            if products:
-                params["last_id"] = products[-1].id
-
-            async with self.client.get("products/list", params=params) as resp:
-                response_json = await resp.json()
-
-            if not response_json.get("products"):
-                has_more = False
-            else:
-                products += [
-                    dacite.from_dict(Product, product_data)
-                    for product_data in response_json.get("products")
-                ]
-
-        return products
-
-    async def edit_products(self, products: list[Product]) -> dict:
-        logger.info("Updating products %s", products)
-
-        body = [
-            {
-                "id": product.id,
-                "price": product.price,
-                "presence": product.presence,
-                "in_stock": product.in_stock,
-            }
-            for product in products
-        ]
-
-        async with self.client.post(
-            "products/edit",
-            json=body,
-        ) as resp:
-            return await resp.json()
+        return [product async for product in self.iter_products()]
+
+    async def edit_products(
+        self,
+        products: list[Product],
+        chunk_size: int = 100,
+        concurrency: int = 4,
+    ) -> EditReport:
+        """Update products in chunks of ``chunk_size``, ``concurrency`` chunks
+        at a time. A failed chunk does not stop the others; every product
+        ends up either in ``processed_ids`` or in ``errors`` of the report.
+        """
+        report = EditReport()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def edit_chunk(chunk: list[Product]):
+            body = [
+                {
+                    "id": product.id,
+                    "price": product.price,
+                    "presence": product.presence,
+                    "in_stock": product.in_stock,
+                }
+                for product in chunk
+            ]
+            async with semaphore:
+                logger.info("Updating products %s", [product.id for product in chunk])
+                try:
+                    response_json = await self.request("POST", "products/edit", json=body)
+                except Exception as exc:
+                    logger.exception("Failed to update products %s", [p.id for p in chunk])
+                    for product in chunk:
+                        report.errors[product.id] = f"{exc.__class__.__name__}: {exc}"
+                    return
+
+            # Prom returns ids as JSON keys, so they are matched as strings
+            # against the chunk's own products.
+            processed_ids = {str(i) for i in response_json.get("processed_ids") or []}
+            errors = response_json.get("errors") or {}
+            if not isinstance(errors, dict):
+                errors = {product.id: errors for product in chunk}
+            errors = {str(product_id): str(error) for product_id, error in errors.items()}
+
+            for product in chunk:
+                if str(product.id) in processed_ids:
+                    report.processed_ids.append(product.id)
+                else:
+                    report.errors[product.id] = errors.get(str(product.id), "Not processed")
+
+        await asyncio.gather(*(
+            edit_chunk(products[start:start + chunk_size])
+            for start in range(0, len(products), chunk_size)
+        ))
+        return report
 
     async def get_orders(
         self,
         status: OrderStatus | None = None,
         date_to: str | None = None,
+        last_id: int | None = None,
+        limit: int = 100,
+        last_modified_from: str | None = None,
     ) -> list[Order]:
-        params = {"limit": 100}
+        params = {"limit": limit}
 
         if date_to:
             params["date_to"] = date_to
 
+        if last_modified_from:
+            params["last_modified_from"] = last_modified_from
+
+        if last_id:
+            params["last_id"] = last_id
+
         if status:
             params["status"] = status.name
 
         logger.info("Getting orders with params: %s", params)
 
-        async with self.client.get("orders/list", params=params) as resp:
-            response_json = await resp.json()
-
-        return [
-            dacite.from_dict(
-                Order, order_data,
-                config=dacite.Config(
-                    type_hooks={
-                        OrderStatus: lambda s: OrderStatuses.get(s).value,
-                        PaymentStatus: lambda s:
-                            PaymentStatuses.get(s, PaymentStatuses.UNDEFINED).value,
-                    }
-                )
+        with metrics.timer("get_orders"):
+            response_json = await self.request("GET", "orders/list", params=params)
+
+        decode_order = decoder(Order)
+        return [decode_order(order_data) for order_data in response_json.get("orders", [])]
+
+    async def get_order(self, order_id: int) -> Order | None:
+        response_json = await self.request("GET", f"orders/{order_id}")
+        if not (order_data := response_json.get("order")):
+            logger.warning("Order %s not found: %s", order_id, response_json)
+            return None
+        return decoder(Order)(order_data)
+
+    async def iter_orders(
+        self,
+        status: OrderStatus | None = None,
+        date_to: str | None = None,
+        limit: int = 100,
+        last_modified_from: str | None = None,
+    ) -> AsyncIterator[Order]:
+        """Walk every page of orders/list using ``last_id`` as the cursor.
+
+        The next page is requested as soon as the current one arrives, so
+        the round-trip overlaps with the caller processing the current page.
+        """
+        page = asyncio.create_task(
+            self.get_orders(
+                status=status,
+                date_to=date_to,
+                limit=limit,
+                last_modified_from=last_modified_from,
             )
-            for order_data in response_json.get("orders", [])
-        ]
+        )
+        try:
+            while orders := await page:
+                page = asyncio.create_task(
+                    self.get_orders(
+                        status=status,
+                        date_to=date_to,
+                        last_id=min(order.id for order in orders),
+                        limit=limit,
+                        last_modified_from=last_modified_from,
+                    )
+                )
+                for order in orders:
+                    yield order
+        finally:
+            page.cancel()
 
     async def set_order_status(
         self,
@@ -112,10 +276,30 @@ class PromAPIClient:
         cancellation_reason: str | None = None,
         cancellation_text: str | None = None,
     ) -> dict:
-        logger.info("Setting order %s status to %s", order, status)
+        if self.status_batcher:
+            return await self.status_batcher.set_order_status(
+                order, status,
+                cancellation_reason=cancellation_reason,
+                cancellation_text=cancellation_text,
+            )
+
+        return await self.set_orders_status(
+            [order], status,
+            cancellation_reason=cancellation_reason,
+            cancellation_text=cancellation_text,
+        )
+
+    async def set_orders_status(
+        self,
+        orders: list[Order],
+        status: OrderStatus,
+        cancellation_reason: str | None = None,
+        cancellation_text: str | None = None,
+    ) -> dict:
+        logger.info("Setting orders %s status to %s", [order.id for order in orders], status)
 
         request_data = {
-            "ids": [order.id],
+            "ids": [order.id for order in orders],
             "status": status.name,
         }
 
@@ -125,8 +309,5 @@ class PromAPIClient:
         if cancellation_text:
             request_data["cancellation_text"] = cancellation_text
 
-        async with self.client.post(
-            "orders/set_status",
-            json=request_data,
-        ) as resp:
-            return await resp.json()
+        with metrics.timer("set_status"):
+            return await self.request("POST", "orders/set_status", json=request_data)
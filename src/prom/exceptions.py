@@ -2,9 +2,19 @@ class OutdatedCookiesError(Exception):
     pass
 
 
+class ScraperUnavailableError(Exception):
+    pass
+
+
 class GeneratingDeclarationException(Exception):
     pass
 
 
 class NotAllowedWarehouseException(Exception):
     pass
+
+
+class PromAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Prom API responded with {status}: {message}")
+        self.status = status
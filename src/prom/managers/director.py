@@ -1,19 +1,11 @@
 from src.models.order import Order
-from src.models.delivery_provider import DeliveryProviders
 
 from src.exceptions import DeliveryProviderNotAllowedError
 from src.prom.client import PromAPIClient
-from src.prom.remote.meest import MeestScraperClient
-from src.prom.remote.nova_poshta import NovaPoshtaScraperClient
-from src.prom.remote.rozetka import RozetkaScraperClient
-from src.prom.remote.ukr_poshta import UkrPoshtaScraperClient
+from src.prom.remote.session import ScraperSession
+from src.prom.managers import registry
 from src.prom.managers.imanager import IManager
-from src.prom.managers.dummy import DummyManager
-from src.prom.managers.meest import MeestManager
-from src.prom.managers.nova_poshta import NovaPoshtaManager
-from src.prom.managers.pickup import PickupManager
-from src.prom.managers.rozetka import RozetkaManager
-from src.prom.managers.ukr_poshta import UkrPoshtaManager
+from src.sessions import SessionFactory
 from src.signal.bot import SignalBot
 
 
@@ -23,59 +15,66 @@ class Director:
         api_client: PromAPIClient,
         messenger: SignalBot | None = None,
         cookies: str | None = None,
+        scraper_base_url: str = "https://my.prom.ua/",
+        session_factory: SessionFactory | None = None,
     ) -> None:
         self.api_client = api_client
         self.cookies = cookies
+        self.scraper_base_url = scraper_base_url
+        self.session_factory = session_factory
         self.messenger = messenger
-        self.scrapers = {}
         self.managers = {}
+        self.scraper_session = None
 
-    def assign(self, order: Order) -> IManager:
+    def get_scraper_session(self) -> ScraperSession:
+        # One cabinet session and cookie jar for all provider scrapers.
+        if self.scraper_session is None:
+            self.scraper_session = ScraperSession(
+                cookies=self.cookies,
+                base_url=self.scraper_base_url,
+                session_factory=self.session_factory,
+            )
+        return self.scraper_session
+
+    async def update_cookies(self, cookies: str | None):
+        # Managers hold scrapers bound to the old session, so they are
+        # rebuilt on the next assign.
+        session, self.scraper_session = self.scraper_session, None
+        self.cookies = cookies
+        self.managers = {}
+        if session is not None:
+            await session.close()
 
-        if order.delivery_option not in self.managers:
+    async def preflight(self) -> bool:
+        return await self.get_scraper_session().preflight()
+
+    def assign(self, order: Order) -> IManager:
+        # Must stay synchronous: refresh_shop calls it from many concurrent
+        # tasks, and without an await in between no two tasks can both
+        # miss the cache and build a second manager.
+        provider_id = order.delivery_option.id if order.delivery_option else None
+        if provider_id not in self.managers:
+            entry = registry.lookup(provider_id)
             manager = None
-            if order.delivery_option == DeliveryProviders.PICKUP.value:
-                manager = PickupManager(
-                    api_client=self.api_client,
-                    messenger=self.messenger,
-                )
-            elif order.delivery_option == DeliveryProviders.NOVA_POSHTA.value:
-                scraper_client = NovaPoshtaScraperClient(cookies=self.cookies)
-                manager = NovaPoshtaManager(
-                    api_client=self.api_client,
-                    scrape_client=scraper_client,
-                    messenger=self.messenger,
-                )
-            elif order.delivery_option == DeliveryProviders.UKR_POSHTA.value:
-                scraper_client = UkrPoshtaScraperClient(cookies=self.cookies)
-                manager = UkrPoshtaManager(
+            if entry.manager:
+                scraper_client = None
+                if entry.scraper:
+                    scraper_client = registry.load(entry.scraper)(
+                        session=self.get_scraper_session(),
+                    )
+                manager = registry.load(entry.manager)(
                     api_client=self.api_client,
                     scrape_client=scraper_client,
                     messenger=self.messenger,
                 )
-            elif order.delivery_option == DeliveryProviders.ROZETKA.value:
-                scraper_client = RozetkaScraperClient(cookies=self.cookies)
-                manager = RozetkaManager(
-                    api_client=self.api_client,
-                    scrape_client=scraper_client,
-                    messenger=self.messenger,
-                )
-            elif order.delivery_option == DeliveryProviders.MEEST.value:
-                scraper_client = MeestScraperClient(cookies=self.cookies)
-                manager = MeestManager(
-                    api_client=self.api_client,
-                    scrape_client=scraper_client,
-                    messenger=self.messenger,
-                )
-            else:
-                manager = DummyManager(
-                    api_client=self.api_client,
-                    messenger=self.messenger,
-                )
 
-            self.managers[order.delivery_option] = manager
+            self.managers[provider_id] = manager
 
-        if self.managers[order.delivery_option] is None:
+        if self.managers[provider_id] is None:
             raise DeliveryProviderNotAllowedError(order)
 
-        return self.managers[order.delivery_option]
+        return self.managers[provider_id]
+
+    async def close(self):
+        if self.scraper_session is not None:
+            await self.scraper_session.close()
@@ -3,20 +3,14 @@ import datetime
 import logging
 
 
-from src.exceptions import (
-    UnknownFinalizationError,
-    IncompletePaymentError,
-    ModifiedDateIsTooOldError,
-)
+from src.exceptions import NotAllowedOrderError, StatusNotUpdatedError
 from src.models.delivery import Delivery
-from src.models.delivery_provider import DeliveryProviders
 from src.models.delivery_status import DeliveryStatuses
 from src.models.order import Order
 from src.models.order_status import OrderStatuses
-from src.models.payment_option import PaymentOptions
-from src.models.payment_status import PaymentStatuses
 from src.prom.client import PromAPIClient
 from src.prom.remote.base import BaseScraperClient
+from src.prom.managers import rules
 from src.prom.managers.imanager import IManager
 from src.signal.bot import SignalBot
 
@@ -25,6 +19,8 @@ logger = logging.getLogger(__name__)
 
 
 class DummyManager(IManager):
+    CANCELLATION_AGE = rules.CANCELLATION_AGE
+    OUTDATED_AGE = rules.OUTDATED_AGE
 
     def __init__(
         self,
@@ -97,102 +93,66 @@ class DummyManager(IManager):
         order = replace(order, status=OrderStatuses.DELIVERED.value)
         return order
 
-    async def cancellation_hook(self, order: Order) -> Order:
-        logger.info("Checking if order %s can be canceled", order)
-
-        if (
-            order.age > datetime.timedelta(days=60) and
-            order.delivery_provider_data and
-            (status := order.delivery_provider_data.unified_status) in [
-                DeliveryStatuses.RETURNED.value.name,
-                DeliveryStatuses.REJECTED.value.name,
-            ]
-        ):
-            order = await self.cancel_order(
-                order,
-                cancellation_reason="another",
-                cancellation_text=DeliveryStatuses.get(status).value.title
-            )
-            await self.notify(order)
-            return order
-
-        if (
-            order.age > datetime.timedelta(days=60) and
-            order.payment_data and
-            (status := order.payment_data.status) in [
-                PaymentStatuses.REFUNDED.value,
-            ]
-        ):
-            order = await self.cancel_order(
-                order,
-                cancellation_reason="another",
-                cancellation_text=status.title
-            )
-            await self.notify(order)
-            return order
-
-        if (
-            order.status == OrderStatuses.PENDING.value and
-            order.payment_option in [
-                PaymentOptions.PROM.value,
-                PaymentOptions.PARTS.value,
-            ]
-        ):
-            if order.age > datetime.timedelta(days=60):
-                order = await self.cancel_order(
-                    order,
-                    cancellation_reason="payment_not_received",
+    async def cancellation_hooks(
+        self,
+        orders: list[Order],
+        now: datetime.datetime | None = None,
+    ) -> list[Order | NotAllowedOrderError]:
+        """Run the cancellation rules over a batch of orders.
+
+        Orders with the same target status and cancellation reason/text are
+        updated with one orders/set_status call. Rejected orders, and orders
+        missing from the response's ``processed_ids``, get their error in
+        place of the order.
+        """
+        decisions = rules.evaluate(orders, now=now)
+        results = list(orders)
+        groups = {}
+        for i, (order, decision) in enumerate(zip(orders, decisions)):
+            logger.info("Order %s: %s (%s)", order, decision.action, decision.rule)
+            if decision.action == rules.REJECT:
+                results[i] = decision.error(order)
+            elif decision.action == rules.FINALIZE:
+                groups.setdefault((OrderStatuses.DELIVERED, None, None), []).append(i)
+            elif decision.action == rules.CANCEL:
+                key = (
+                    OrderStatuses.CANCELED,
+                    decision.cancellation_reason,
+                    decision.cancellation_text,
                 )
-                await self.notify(order)
-                return order
-
-            raise IncompletePaymentError(order)
-
-        if order.status == OrderStatuses.RECEIVED.value:
-            # if order.datetime_created.date() < datetime.date(2020, 1, 1):
-            #     order = await self.finalize_order(order)
-            # el
-            if (
-                (
-                    order.payment_option is None or
-                    order.payment_option in [
-                        PaymentOptions.CASH.value,
-                        PaymentOptions.CASH_ON_DELIVERY.value,
-                        PaymentOptions.CASH_ON_DELIVERY_HISTORICAL.value,
-                        PaymentOptions.CASH_ON_DELIVERY_NOVA_POSHTA.value,
-                        PaymentOptions.PRIVAT_BANK_CARD.value,
-                        PaymentOptions.NON_CASH_WITH_VAT.value,
-                    ]
-                ) and
-                order.delivery_provider_data and
-                (
-                    order.delivery_provider_data.unified_status in [
-                        DeliveryStatuses.DELIVERED_CASH_CRUISE.value.name,
-                        DeliveryStatuses.DELIVERED_CASH_RECEIVED.value.name,
-                    ] or
-                    (
-                        order.delivery_provider_data.unified_status in [
-                            DeliveryStatuses.DELIVERED.value.name
-                        ] and
-                        order.delivery_option in [
-                            DeliveryProviders.MEEST.value,
-                            DeliveryProviders.UKR_POSHTA.value,
-                            DeliveryProviders.NOVA_POSHTA.value,
-                        ]
-                    )
+                groups.setdefault(key, []).append(i)
+
+        for (status, cancellation_reason, cancellation_text), indices in groups.items():
+            group = [orders[i] for i in indices]
+            if len(group) == 1:
+                response = await self.api_client.set_order_status(
+                    group[0], status.value,
+                    cancellation_reason=cancellation_reason,
+                    cancellation_text=cancellation_text,
                 )
-            ):
-                order = await self.finalize_order(order)
-                await self.notify(order)
-                return order
-
-        if order.age > datetime.timedelta(days=7):
-            raise ModifiedDateIsTooOldError(order)
+            else:
+                response = await self.api_client.set_orders_status(
+                    group, status.value,
+                    cancellation_reason=cancellation_reason,
+                    cancellation_text=cancellation_text,
+                )
+            processed_ids = {str(i) for i in (response or {}).get("processed_ids") or []}
+            for i in indices:
+                if str(orders[i].id) not in processed_ids:
+                    logger.warning("Order %s status was not updated: %s", orders[i], response)
+                    results[i] = StatusNotUpdatedError(orders[i])
+                    continue
+                results[i] = replace(orders[i], status=status.value)
+                await self.notify(results[i])
 
-        if order.status == OrderStatuses.RECEIVED.value:
-            raise UnknownFinalizationError(order)
+        return results
 
-        return order
+    async def cancellation_hook(self, order: Order) -> Order:
+        logger.info("Checking if order %s can be canceled", order)
+        result, = await self.cancellation_hooks([order])
+        if isinstance(result, NotAllowedOrderError):
+            raise result
+        return result
 
     async def process_order(self, order: Order, initial: bool = False) -> Order:
         logger.info("%s is processing order %s", self.__class__, order)
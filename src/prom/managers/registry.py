@@ -0,0 +1,63 @@
+"""Delivery providers the bot knows how to handle.
+
+Managers and scrapers are referenced as ``"module:Class"`` strings and only
+imported when the first order for their provider shows up. Supporting a new
+provider is one ``register`` call.
+"""
+
+import importlib
+from dataclasses import dataclass
+
+from src.models.delivery_provider import DeliveryProvider, DeliveryProviders
+
+
+@dataclass(frozen=True)
+class ProviderEntry:
+    # None disallows the provider altogether.
+    manager: str | None
+    scraper: str | None = None
+
+
+REGISTRY: dict[int, ProviderEntry] = {}
+
+# Used for providers without an entry, e.g. Justin.
+DEFAULT = ProviderEntry(manager="src.prom.managers.dummy:DummyManager")
+
+
+def register(provider: DeliveryProvider, manager: str | None, scraper: str | None = None):
+    REGISTRY[provider.id] = ProviderEntry(manager=manager, scraper=scraper)
+
+
+def lookup(provider_id: int | None) -> ProviderEntry:
+    return REGISTRY.get(provider_id, DEFAULT)
+
+
+def load(path: str) -> type:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+register(
+    DeliveryProviders.PICKUP.value,
+    manager="src.prom.managers.pickup:PickupManager",
+)
+register(
+    DeliveryProviders.NOVA_POSHTA.value,
+    manager="src.prom.managers.nova_poshta:NovaPoshtaManager",
+    scraper="src.prom.remote.nova_poshta:NovaPoshtaScraperClient",
+)
+register(
+    DeliveryProviders.UKR_POSHTA.value,
+    manager="src.prom.managers.ukr_poshta:UkrPoshtaManager",
+    scraper="src.prom.remote.ukr_poshta:UkrPoshtaScraperClient",
+)
+register(
+    DeliveryProviders.ROZETKA.value,
+    manager="src.prom.managers.rozetka:RozetkaManager",
+    scraper="src.prom.remote.rozetka:RozetkaScraperClient",
+)
+register(
+    DeliveryProviders.MEEST.value,
+    manager="src.prom.managers.meest:MeestManager",
+    scraper="src.prom.remote.meest:MeestScraperClient",
+)
@@ -0,0 +1,223 @@
+"""Finalize/cancel rules for orders, evaluated as a table.
+
+Every rule lists the values an order field may take (``None`` matches
+anything) and the minimum order age. The first matching rule decides what
+happens to the order. Evaluation is pure, so a whole batch of orders is
+checked against one ``now`` without touching the API.
+"""
+
+import datetime
+from dataclasses import dataclass, field
+from typing import Callable
+
+from src.exceptions import (
+    IncompletePaymentError,
+    ModifiedDateIsTooOldError,
+    NotAllowedOrderError,
+    UnknownFinalizationError,
+)
+from src.models.delivery_provider import DeliveryProviders
+from src.models.delivery_status import DeliveryStatuses
+from src.models.order import Order
+from src.models.order_status import OrderStatuses
+from src.models.payment_option import PaymentOptions
+from src.models.payment_status import PaymentStatuses
+
+
+# Orders older than this are cancelled once they are returned,
+# refunded or left unpaid.
+CANCELLATION_AGE = datetime.timedelta(days=60)
+# Orders older than this are no longer expected to change on their own.
+OUTDATED_AGE = datetime.timedelta(days=7)
+
+FINALIZE = "finalize"
+CANCEL = "cancel"
+REJECT = "reject"
+IGNORE = "ignore"
+
+
+@dataclass(frozen=True)
+class Facts:
+    """The order fields the rules look at, extracted once per order."""
+    status: str | None
+    payment_option: int | None
+    payment_status: str | None
+    delivery_status: str | None
+    delivery_option: int | None
+    age: datetime.timedelta
+
+    @classmethod
+    def of(cls, order: Order, now: datetime.datetime) -> "Facts":
+        payment_status = order.payment_data.status if order.payment_data else None
+        return cls(
+            status=order.status.name if order.status else None,
+            payment_option=order.payment_option.id if order.payment_option else None,
+            payment_status=payment_status.name if payment_status else None,
+            delivery_status=(
+                order.delivery_provider_data.unified_status
+                if order.delivery_provider_data else None
+            ),
+            delivery_option=order.delivery_option.id if order.delivery_option else None,
+            age=now - order.datetime_created,
+        )
+
+
+@dataclass(frozen=True)
+class Decision:
+    action: str
+    rule: str | None = None
+    cancellation_reason: str | None = None
+    cancellation_text: str | None = None
+    error: type[NotAllowedOrderError] | None = None
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    action: str
+    statuses: frozenset | None = None
+    payment_options: frozenset | None = None
+    payment_statuses: frozenset | None = None
+    delivery_statuses: frozenset | None = None
+    delivery_options: frozenset | None = None
+    older_than: datetime.timedelta | None = None
+    cancellation_reason: str | None = None
+    cancellation_text: Callable[[Facts], str] | None = None
+    error: type[NotAllowedOrderError] | None = None
+    checks: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Only the constrained fields are checked.
+        checks = tuple(
+            (name, allowed) for name, allowed in (
+                ("status", self.statuses),
+                ("payment_option", self.payment_options),
+                ("payment_status", self.payment_statuses),
+                ("delivery_status", self.delivery_statuses),
+                ("delivery_option", self.delivery_options),
+            )
+            if allowed is not None
+        )
+        object.__setattr__(self, "checks", checks)
+
+    def matches(self, facts: Facts) -> bool:
+        if self.older_than is not None and facts.age <= self.older_than:
+            return False
+        return all(getattr(facts, name) in allowed for name, allowed in self.checks)
+
+    def decide(self, facts: Facts) -> Decision:
+        return Decision(
+            action=self.action,
+            rule=self.name,
+            cancellation_reason=self.cancellation_reason,
+            cancellation_text=self.cancellation_text(facts) if self.cancellation_text else None,
+            error=self.error,
+        )
+
+
+def names(*members) -> frozenset:
+    return frozenset(member.value.name for member in members)
+
+
+def ids(*members) -> frozenset:
+    return frozenset(member.value.id for member in members)
+
+
+PREPAID = ids(PaymentOptions.PROM, PaymentOptions.PARTS)
+# Payment options finalized once the parcel is delivered. None covers
+# orders without a payment option.
+PAID_ON_DELIVERY = ids(
+    PaymentOptions.CASH,
+    PaymentOptions.CASH_ON_DELIVERY,
+    PaymentOptions.CASH_ON_DELIVERY_HISTORICAL,
+    PaymentOptions.CASH_ON_DELIVERY_NOVA_POSHTA,
+    PaymentOptions.PRIVAT_BANK_CARD,
+    PaymentOptions.NON_CASH_WITH_VAT,
+) | {None}
+
+RULES = (
+    Rule(
+        name="returned",
+        action=CANCEL,
+        delivery_statuses=names(DeliveryStatuses.RETURNED, DeliveryStatuses.REJECTED),
+        older_than=CANCELLATION_AGE,
+        cancellation_reason="another",
+        cancellation_text=lambda facts: DeliveryStatuses.get(facts.delivery_status).value.title,
+    ),
+    Rule(
+        name="refunded",
+        action=CANCEL,
+        payment_statuses=names(PaymentStatuses.REFUNDED),
+        older_than=CANCELLATION_AGE,
+        cancellation_reason="another",
+        cancellation_text=lambda facts: PaymentStatuses.get(facts.payment_status).value.title,
+    ),
+    Rule(
+        name="payment_not_received",
+        action=CANCEL,
+        statuses=names(OrderStatuses.PENDING),
+        payment_options=PREPAID,
+        older_than=CANCELLATION_AGE,
+        cancellation_reason="payment_not_received",
+    ),
+    Rule(
+        name="awaiting_payment",
+        action=REJECT,
+        statuses=names(OrderStatuses.PENDING),
+        payment_options=PREPAID,
+        error=IncompletePaymentError,
+    ),
+    Rule(
+        name="cash_received",
+        action=FINALIZE,
+        statuses=names(OrderStatuses.RECEIVED),
+        payment_options=PAID_ON_DELIVERY,
+        delivery_statuses=names(
+            DeliveryStatuses.DELIVERED_CASH_CRUISE,
+            DeliveryStatuses.DELIVERED_CASH_RECEIVED,
+        ),
+    ),
+    Rule(
+        name="delivered",
+        action=FINALIZE,
+        statuses=names(OrderStatuses.RECEIVED),
+        payment_options=PAID_ON_DELIVERY,
+        delivery_statuses=names(DeliveryStatuses.DELIVERED),
+        delivery_options=ids(
+            DeliveryProviders.MEEST,
+            DeliveryProviders.UKR_POSHTA,
+            DeliveryProviders.NOVA_POSHTA,
+        ),
+    ),
+    Rule(
+        name="outdated",
+        action=REJECT,
+        older_than=OUTDATED_AGE,
+        error=ModifiedDateIsTooOldError,
+    ),
+    Rule(
+        name="unknown_finalization",
+        action=REJECT,
+        statuses=names(OrderStatuses.RECEIVED),
+        error=UnknownFinalizationError,
+    ),
+)
+
+NO_DECISION = Decision(action=IGNORE)
+
+
+def evaluate(
+    orders: list[Order],
+    now: datetime.datetime | None = None,
+    rules: tuple[Rule, ...] = RULES,
+) -> list[Decision]:
+    """Decide what to do with every order, in order, as of ``now``."""
+    now = datetime.datetime.now() if now is None else now
+    decisions = []
+    for order in orders:
+        facts = Facts.of(order, now)
+        decisions.append(next(
+            (rule.decide(facts) for rule in rules if rule.matches(facts)),
+            NO_DECISION,
+        ))
+    return decisions
@@ -0,0 +1,72 @@
+import asyncio
+import datetime
+import email.utils
+import random
+import time
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts to throttling (AIMD).
+
+    Every 429 halves the rate down to ``min_rate``; every successful
+    request wins back a twentieth of ``max_rate``.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        min_rate: float | None = None,
+    ):
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Waiters queue on the lock, so tokens are handed out in FIFO order.
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def throttled(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+    def succeeded(self):
+        self._refill()
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def retry_after(value: str | None) -> float | None:
+    """Seconds to wait according to a Retry-After header, if it has one."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+
+def backoff(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
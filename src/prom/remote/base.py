@@ -1,42 +1,57 @@
-import base64
 import logging
 
 import aiohttp
 
-from src.prom.exceptions import OutdatedCookiesError
-from src.prom.utils import prepare_cookies, dict_from_cookiejar
+from src import metrics
+from src.prom.remote.session import ScraperSession
+from src.prom.remote.steps import Step, run_steps
+from src.prom.utils import dict_from_cookiejar
 from src.models.order import Order
+from src.sessions import SessionFactory
 
 
 logger = logging.getLogger(__name__)
 
 
 class BaseScraperClient:
+    provider: str | None = None
+
     def __init__(
         self,
         cookies: str | None = None,
         base_url: str = "https://my.prom.ua/",
+        session_factory: SessionFactory | None = None,
+        session: ScraperSession | None = None,
     ):
-        self.base_url = base_url
-        self.cookies = cookies
-
-        if self.cookies:
-            cookies = {}
-            cookies_str = base64.b64decode(self.cookies).decode("utf-8")
-            self.cookies = prepare_cookies(cookies_str)
-
-        self.client = aiohttp.ClientSession(
-            base_url=self.base_url,
-            headers={
-                "Content-Type": "application/json",
-            },
-            cookies=self.cookies,
-        )
+        # Without a shared session the client owns (and closes) its own.
+        self.owns_session = session is None
+        if session is None:
+            session = ScraperSession(
+                cookies=cookies, base_url=base_url, session_factory=session_factory,
+            )
+        self.session = session
+        self.base_url = session.base_url
+        self.cookies = session.cookies
+        self.client = session.client
+
+    def timer(self, step: str):
+        return metrics.timer(f"generate_declaration.{step}", provider=self.provider)
+
+    async def run_steps(self, steps: dict[str, Step]) -> dict:
+        self.session.ensure_valid()
+        return await run_steps(steps, timer=self.timer)
 
     @classmethod
     def order_url(cls, order_id: int):
         return f"https://my.prom.ua/cms/order/edit/{order_id}"
 
+    async def close(self):
+        if self.owns_session:
+            await self.session.close()
+
+    async def read_json(self, resp: aiohttp.ClientResponse):
+        return await self.session.read_json(resp)
+
     def post_headers(self, order_id: int, owner_id: int) -> dict:
         cookies = dict_from_cookiejar(self.client.cookie_jar)
         return {
@@ -68,21 +83,10 @@ class BaseScraperClient:
                 "sorted_products": 0,
             },
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return (await resp.json())["order"]
+            return (await self.read_json(resp))["order"]
 
     async def get_auth(self) -> dict:
-        async with self.client.get(
-            "/remote/auth/info",
-        ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return await resp.json()
+        return await self.session.get_auth()
 
     async def generate_declaration(self, order: Order) -> dict:
         raise NotImplementedError
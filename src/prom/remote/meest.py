@@ -1,7 +1,8 @@
 import logging
+from functools import partial
 
 from src.models.order import Order
-from src.prom.exceptions import OutdatedCookiesError, GeneratingDeclarationException
+from src.prom.exceptions import GeneratingDeclarationException
 from src.prom.remote.base import BaseScraperClient
 
 
@@ -9,13 +10,18 @@ logger = logging.getLogger(__name__)
 
 
 class MeestScraperClient(BaseScraperClient):
+    provider = "meest"
 
     async def generate_declaration(self, order: Order) -> dict:
         logger.info("Generating declaration for order %s", order)
-        scraped_auth = await self.get_auth()
-        init_data_order = await self._init_data_order(order)
-        delivery_info = await self._delivery_info(order, scraped_auth, init_data_order)
-        return delivery_info
+        results = await self.run_steps({
+            "get_auth": (self.get_auth, ()),
+            "init_data_order": (partial(self._init_data_order, order), ()),
+            "delivery_info": (
+                partial(self._delivery_info, order), ("get_auth", "init_data_order"),
+            ),
+        })
+        return results["delivery_info"]
 
     async def _init_data_order(self, order: Order):
         async with self.client.get(
@@ -24,11 +30,7 @@ class MeestScraperClient(BaseScraperClient):
                 "order_id": order.id,
             }
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return (await resp.json())["data"]
+            return (await self.read_json(resp))["data"]
 
     async def _delivery_info(
         self,
@@ -79,8 +81,4 @@ class MeestScraperClient(BaseScraperClient):
             ),
             json=request,
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return await resp.json()
+            return await self.read_json(resp)
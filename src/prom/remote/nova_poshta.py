@@ -1,8 +1,9 @@
 import datetime
 import logging
+from functools import partial
 
 from src.models.order import Order
-from src.prom.exceptions import OutdatedCookiesError, GeneratingDeclarationException
+from src.prom.exceptions import GeneratingDeclarationException
 from src.prom.remote.base import BaseScraperClient
 
 
@@ -10,13 +11,17 @@ logger = logging.getLogger(__name__)
 
 
 class NovaPoshtaScraperClient(BaseScraperClient):
+    provider = "nova_poshta"
 
     async def generate_declaration(self, order: Order) -> dict:
         logger.info("Generating declaration for order %s", order)
-        scraped_order = await self.get_order(order)
-        init_data_order = await self._init_data_order(scraped_order)
-        delivery_info = await self._delivery_info(scraped_order, init_data_order)
-        return delivery_info
+        # Every Nova Poshta step needs the previous one, so this is a chain.
+        results = await self.run_steps({
+            "get_order": (partial(self.get_order, order), ()),
+            "init_data_order": (self._init_data_order, ("get_order",)),
+            "delivery_info": (self._delivery_info, ("get_order", "init_data_order")),
+        })
+        return results["delivery_info"]
 
     async def _init_data_order(
         self,
@@ -31,11 +36,7 @@ class NovaPoshtaScraperClient(BaseScraperClient):
                 "cart_total_price": scraped_order["cartTotalPriceInDefaultCurrency"],
             }
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return (await resp.json())["data"]
+            return (await self.read_json(resp))["data"]
 
     async def _delivery_info(
         self,
@@ -103,8 +104,4 @@ class NovaPoshtaScraperClient(BaseScraperClient):
             ),
             json=request,
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return await resp.json()
+            return await self.read_json(resp)
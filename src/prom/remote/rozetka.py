@@ -1,7 +1,7 @@
 import logging
+from functools import partial
 
 from src.models.order import Order
-from src.prom.exceptions import OutdatedCookiesError
 from src.prom.remote.base import BaseScraperClient
 
 
@@ -9,12 +9,15 @@ logger = logging.getLogger(__name__)
 
 
 class RozetkaScraperClient(BaseScraperClient):
+    provider = "rozetka_delivery"
 
     async def generate_declaration(self, order: Order) -> dict:
         logger.info("Generating declaration for order %s", order)
-        scraped_auth = await self.get_auth()
-        delivery_info = await self._delivery_info(order, scraped_auth)
-        return delivery_info
+        results = await self.run_steps({
+            "get_auth": (self.get_auth, ()),
+            "delivery_info": (partial(self._delivery_info, order), ("get_auth",)),
+        })
+        return results["delivery_info"]
 
     async def _delivery_info(
         self,
@@ -31,8 +34,4 @@ class RozetkaScraperClient(BaseScraperClient):
                 "order_id": order.id,
             },
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return await resp.json()
+            return await self.read_json(resp)
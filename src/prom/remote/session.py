@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import logging
+import time
+
+import aiohttp
+
+from src import codec
+from src.prom.exceptions import OutdatedCookiesError, ScraperUnavailableError
+from src.prom.utils import prepare_cookies
+from src.sessions import SessionFactory, new_session
+
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperSession:
+    """Authenticated session to the Prom cabinet, shared by every provider
+    scraper so the cookies are decoded once and csrf updates land in one jar.
+    """
+
+    def __init__(
+        self,
+        cookies: str | None = None,
+        base_url: str = "https://my.prom.ua/",
+        session_factory: SessionFactory | None = None,
+        auth_ttl: float = 3600,
+    ):
+        self.base_url = base_url
+        self.cookies = cookies
+
+        if self.cookies:
+            cookies_str = base64.b64decode(self.cookies).decode("utf-8")
+            self.cookies = prepare_cookies(cookies_str)
+
+        self.client = new_session(
+            session_factory,
+            base_url=self.base_url,
+            headers={
+                "Content-Type": "application/json",
+            },
+            cookies=self.cookies,
+        )
+
+        # /remote/auth/info only changes with the cookies, so it is fetched
+        # once per ``auth_ttl`` and dropped whenever they turn out outdated.
+        self.auth_ttl = auth_ttl
+        self.auth = None
+        self.auth_expires = 0.0
+        self.auth_lock = asyncio.Lock()
+        # Set by the first outdated-cookies response, or by a preflight that
+        # could not reach the cabinet; every scraper then fails fast instead
+        # of sending requests that cannot succeed. Reset by the next preflight.
+        self.invalid = False
+        self.unavailable = False
+
+    async def close(self):
+        await self.client.close()
+
+    def ensure_valid(self):
+        if self.invalid:
+            raise OutdatedCookiesError
+        if self.unavailable:
+            raise ScraperUnavailableError
+
+    async def preflight(self) -> bool:
+        """Check the cookies with one cheap request. Returns False if they are outdated.
+
+        Network errors leave the scrapers unavailable until the next
+        preflight, but do not count as outdated cookies.
+        """
+        if self.invalid:
+            # The jar was cleared when the cookies were rejected.
+            self.client.cookie_jar.update_cookies(self.cookies or {})
+            self.invalid = False
+        self.unavailable = False
+        try:
+            await self.get_auth()
+        except OutdatedCookiesError:
+            return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.warning("Prom cabinet is unreachable, declarations are skipped: %r", exc)
+            self.unavailable = True
+        return True
+
+    async def get_auth(self) -> dict:
+        self.ensure_valid()
+        async with self.auth_lock:
+            if self.auth is None or time.monotonic() >= self.auth_expires:
+                async with self.client.get("/remote/auth/info") as resp:
+                    self.auth = await self.read_json(resp)
+                self.auth_expires = time.monotonic() + self.auth_ttl
+            return self.auth
+
+    def invalidate_auth(self):
+        self.auth = None
+
+    async def read_json(self, resp: aiohttp.ClientResponse):
+        # The cabinet answers with its login page once the cookies expire.
+        if resp.content_type == "text/html":
+            logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
+            self.client.cookie_jar.clear()
+            self.invalidate_auth()
+            self.invalid = True
+            raise OutdatedCookiesError
+        return await resp.json(loads=codec.loads)
@@ -0,0 +1,41 @@
+import asyncio
+import contextlib
+from collections.abc import Awaitable, Callable
+
+
+Step = tuple[Callable[..., Awaitable], tuple[str, ...]]
+
+
+async def run_steps(steps: dict[str, Step], timer: Callable | None = None) -> dict:
+    """Run a small dependency graph of coroutine steps.
+
+    ``steps`` maps a step name to ``(func, dependencies)``; ``func`` is
+    called with the results of its dependencies, in order, as soon as they
+    are available, so independent steps run concurrently. Dependencies must
+    be listed before the steps that use them. The first failure cancels the
+    remaining steps and is re-raised.
+    """
+    tasks = {}
+
+    async def run(name: str):
+        func, dependencies = steps[name]
+        args = [await tasks[dependency] for dependency in dependencies]
+        with timer(name) if timer else contextlib.nullcontext():
+            return await func(*args)
+
+    for name, (_, dependencies) in steps.items():
+        if unknown := [dependency for dependency in dependencies if dependency not in tasks]:
+            raise ValueError(f"Step {name!r} depends on undefined steps {unknown}")
+        tasks[name] = asyncio.create_task(run(name))
+
+    try:
+        done, _ = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks.values():
+            if task in done and task.exception():
+                raise task.exception()
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+    return {name: task.result() for name, task in tasks.items()}
@@ -1,7 +1,7 @@
 import logging
+from functools import partial
 
 from src.models.order import Order
-from src.prom.exceptions import OutdatedCookiesError
 from src.prom.remote.base import BaseScraperClient
 
 
@@ -9,19 +9,20 @@ logger = logging.getLogger(__name__)
 
 
 class UkrPoshtaScraperClient(BaseScraperClient):
+    provider = "ukrposhta"
 
     async def generate_declaration(self, order: Order) -> dict:
         logger.info("Generating declaration for order %s", order)
-        scraped_auth = await self.get_auth()
-        scraped_order = await self.get_order(order)
-        init_data_order = await self._init_data_order(order)
-        delivery_info = await self._delivery_info(
-            order,
-            scraped_auth,
-            scraped_order,
-            init_data_order,
-        )
-        return delivery_info
+        results = await self.run_steps({
+            "get_auth": (self.get_auth, ()),
+            "get_order": (partial(self.get_order, order), ()),
+            "init_data_order": (partial(self._init_data_order, order), ()),
+            "delivery_info": (
+                partial(self._delivery_info, order),
+                ("get_auth", "get_order", "init_data_order"),
+            ),
+        })
+        return results["delivery_info"]
 
     async def _init_data_order(
         self,
@@ -34,11 +35,7 @@ class UkrPoshtaScraperClient(BaseScraperClient):
                 "delivery_option_id": order.delivery_option.id,
             }
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return (await resp.json())["data"]
+            return (await self.read_json(resp))["data"]
 
     async def _delivery_info(
         self,
@@ -60,8 +57,4 @@ class UkrPoshtaScraperClient(BaseScraperClient):
             headers=self.post_headers(order_id=order.id, owner_id=scraped_auth["id"]),
             json=request,
         ) as resp:
-            if resp.content_type == "text/html":
-                logger.error("Cookies are outdated. Clearing cookies and raising an exception.")
-                self.client.cookie_jar.clear()
-                raise OutdatedCookiesError
-            return await resp.json()
+            return await self.read_json(resp)
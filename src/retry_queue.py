@@ -0,0 +1,107 @@
+import datetime
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetryQueue:
+    """Orders whose declaration failed, waiting to be retried.
+
+    Every failure doubles the delay before the next attempt (from
+    ``base_delay`` up to ``max_delay`` seconds). After ``max_attempts``
+    failures the order is dead-lettered and no longer retried.
+
+    Entries are flat dicts (id, attempts, due, error, state) so they can be
+    stored in a worksheet like the orders state.
+    """
+
+    PENDING = "pending"
+    DEAD = "dead"
+
+    def __init__(
+        self,
+        entries: dict | None = None,
+        max_attempts: int = 5,
+        base_delay: float = 30,
+        max_delay: float = 3600,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.entries = {}
+        for order_id, entry in (entries or {}).items():
+            try:
+                self.entries[str(order_id)] = {
+                    "id": str(order_id),
+                    "attempts": int(entry["attempts"]),
+                    "due": float(entry["due"]),
+                    "error": entry.get("error") or "",
+                    "state": entry.get("state") or self.PENDING,
+                }
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Ignoring malformed retry entry %s: %s", order_id, entry)
+
+    def __contains__(self, order_id: str) -> bool:
+        return str(order_id) in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def attempts(self, order_id: str) -> int:
+        entry = self.entries.get(str(order_id))
+        return entry["attempts"] if entry else 0
+
+    def delay(self, attempts: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def add(self, order_id: str, error: str, now: float | None = None) -> bool:
+        """Record a failed attempt. Returns True if the order was dead-lettered."""
+        now = datetime.datetime.now().timestamp() if now is None else now
+        attempts = self.attempts(order_id) + 1
+        state = self.DEAD if attempts >= self.max_attempts else self.PENDING
+        self.entries[str(order_id)] = {
+            "id": str(order_id),
+            "attempts": attempts,
+            "due": now + self.delay(attempts),
+            "error": error,
+            "state": state,
+        }
+        if state == self.DEAD:
+            logger.warning("Order %s failed %s times, giving up: %s", order_id, attempts, error)
+        else:
+            logger.info(
+                "Order %s failed (%s), retry %s in %.0f s",
+                order_id, error, attempts, self.delay(attempts),
+            )
+        return state == self.DEAD
+
+    def reschedule(self, order_id: str, now: float | None = None):
+        """Push the next attempt back without counting a failure."""
+        entry = self.entries.get(str(order_id))
+        if entry:
+            now = datetime.datetime.now().timestamp() if now is None else now
+            entry["due"] = now + self.delay(max(1, entry["attempts"]))
+
+    def remove(self, order_id: str):
+        self.entries.pop(str(order_id), None)
+
+    def is_dead(self, order_id: str) -> bool:
+        entry = self.entries.get(str(order_id))
+        return bool(entry) and entry["state"] == self.DEAD
+
+    def is_waiting(self, order_id: str, now: float | None = None) -> bool:
+        """True while the order's next attempt is not due yet."""
+        entry = self.entries.get(str(order_id))
+        now = datetime.datetime.now().timestamp() if now is None else now
+        return bool(entry) and entry["state"] == self.PENDING and entry["due"] > now
+
+    def due(self, now: float | None = None) -> list[str]:
+        now = datetime.datetime.now().timestamp() if now is None else now
+        return sorted(
+            (
+                order_id for order_id, entry in self.entries.items()
+                if entry["state"] == self.PENDING and entry["due"] <= now
+            ),
+            key=lambda order_id: self.entries[order_id]["due"],
+        )
@@ -0,0 +1,67 @@
+import aiohttp
+
+from src import codec
+
+
+class SessionFactory:
+    """Creates aiohttp sessions that share one tuned TCPConnector, so
+    sockets, TLS sessions and DNS lookups are reused by every client.
+
+    All sessions created here are closed by ``close()``.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        keepalive_timeout: float = 60,
+        ttl_dns_cache: int = 300,
+        **session_kwargs,
+    ):
+        self.connector_kwargs = {
+            "limit": limit,
+            "limit_per_host": limit_per_host,
+            "keepalive_timeout": keepalive_timeout,
+            "ttl_dns_cache": ttl_dns_cache,
+            "use_dns_cache": True,
+        }
+        self.session_kwargs = session_kwargs
+        self.connector = None
+        self.sessions = []
+
+    def create(self, **kwargs) -> aiohttp.ClientSession:
+        if self.connector is None or self.connector.closed:
+            self.connector = aiohttp.TCPConnector(**self.connector_kwargs)
+
+        session = aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=False,
+            **({"json_serialize": codec.dumps} | self.session_kwargs | kwargs),
+        )
+        # Clients recreate their sessions after closing them, so closed ones
+        # are dropped instead of piling up for the life of the process.
+        self.sessions = [s for s in self.sessions if not s.closed]
+        self.sessions.append(session)
+        return session
+
+    async def close(self):
+        for session in self.sessions:
+            await session.close()
+        self.sessions = []
+
+        if self.connector is not None:
+            await self.connector.close()
+            self.connector = None
+
+    async def __aenter__(self) -> "SessionFactory":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+def new_session(session_factory: SessionFactory | None = None, **kwargs) -> aiohttp.ClientSession:
+    """Session from the shared factory, or a standalone one without it."""
+    if session_factory is None:
+        return aiohttp.ClientSession(**({"json_serialize": codec.dumps} | kwargs))
+    return session_factory.create(**kwargs)
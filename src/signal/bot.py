@@ -1,6 +1,9 @@
 import asyncio
 import aiohttp
 
+from src import metrics
+from src.sessions import SessionFactory, new_session
+
 
 class SignalBot:
     def __init__(
@@ -9,8 +12,11 @@ class SignalBot:
         phone_number: str,
         group_id: str,
         force: bool = False,
+        session_factory: SessionFactory | None = None,
     ):
         self.service = signal_service
+        self.session_factory = session_factory
+        self.session = None
         self.phone_number = phone_number
         self.group_id = group_id
 
@@ -23,12 +29,22 @@ class SignalBot:
                 "------------------------------"
             )
 
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = new_session(self.session_factory)
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
     async def health(self):
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"http://{self.service}/v1/health", ssl=False, timeout=10) as resp:
-                    if resp.status == 204:
-                        return True
+            async with self.get_session().get(
+                f"http://{self.service}/v1/health", ssl=False, timeout=10,
+            ) as resp:
+                if resp.status == 204:
+                    return True
         except asyncio.TimeoutError:
             return False
         except aiohttp.ClientConnectionError:
@@ -58,8 +74,8 @@ class SignalBot:
                 "start": len(message),
             })
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
+        with metrics.timer("signal_send"):
+            async with self.get_session().post(
                 f"http://{self.service}/v2/send",
                 json={
                     "message": message,
@@ -0,0 +1,112 @@
+import base64
+import datetime
+import random
+
+import ujson
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.models.client import Client
+from src.models.delivery_provider import DeliveryProviders
+from src.models.order import Order
+from src.models.order_status import OrderStatuses
+from src.models.payment_option import PaymentOptions
+
+
+CSRF_TOKEN = "fake-csrf-token"
+
+
+def order(id, provider=DeliveryProviders.NOVA_POSHTA):
+    return Order(
+        id=id,
+        status=OrderStatuses.PAID.value,
+        price="100 грн",
+        date_created="2024-01-01T10:00:00",
+        date_modified="2024-01-01T10:00:00",
+        delivery_address="",
+        delivery_option=provider.value if provider else None,
+        client=Client(id=id),
+    )
+
+
+async def serve(handler):
+    """Local Prom API server routing every /api/v1/ request to ``handler``."""
+    app = web.Application()
+    app.router.add_route("*", "/api/v1/{path:.*}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def fake_cookies() -> str:
+    """Cookies blob in the format AllBuyBot expects in COOKIES."""
+    cookies = [
+        {"name": "csrf_token", "value": CSRF_TOKEN, "domain": "127.0.0.1", "path": "/"},
+        {"name": "auth", "value": "fake-session", "domain": "127.0.0.1", "path": "/"},
+    ]
+    return base64.b64encode(
+        ";".join(ujson.dumps(cookie) for cookie in cookies).encode("utf-8")
+    ).decode("utf-8")
+
+
+def synthetic_orders(count: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    now = datetime.datetime.now().replace(microsecond=0)
+    providers = [
+        DeliveryProviders.NOVA_POSHTA, DeliveryProviders.UKR_POSHTA,
+        DeliveryProviders.MEEST, DeliveryProviders.ROZETKA,
+        DeliveryProviders.PICKUP, DeliveryProviders.JUSTIN,
+    ]
+    payment_options = [
+        PaymentOptions.CASH_ON_DELIVERY, PaymentOptions.PROM, PaymentOptions.CASH,
+    ]
+    unified_statuses = [None, "on_the_way", "in_warehouse", "delivered", "returned"]
+
+    orders = []
+    for order_id in range(1, count + 1):
+        provider = rnd.choice(providers).value
+        payment_option = rnd.choice(payment_options).value
+        created = now - datetime.timedelta(days=rnd.choice([0, 1, 3, 10, 90]))
+        status = rnd.choices(["received", "paid", "pending"], weights=[6, 2, 2])[0]
+        orders.append({
+            "id": order_id,
+            "status": status,
+            "price": f"{rnd.randint(100, 5000)} грн",
+            "date_created": created.isoformat(),
+            "date_modified": created.isoformat(),
+            "delivery_address": "м. Київ, Відділення №1",
+            "delivery_option": {"id": provider.id, "name": provider.name, "comment": None},
+            "client": {
+                "id": order_id, "first_name": "Тест", "last_name": "Клієнт",
+                "phone": "+380000000000",
+            },
+            "client_notes": None,
+            "payment_option": {"id": payment_option.id, "name": payment_option.name},
+            "payment_data": {"type": "prom", "status": rnd.choice(["paid", "unpaid"])},
+            "delivery_provider_data": {
+                "provider": provider.type,
+                "unified_status": rnd.choice(unified_statuses),
+                "declaration_number": None,
+            },
+            "phone": "+380000000000",
+        })
+    return orders
+
+
+def synthetic_products(count: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "id": product_id,
+            "sku": f"SKU-{product_id:06d}",
+            "name": f"Товар {product_id}",
+            "presence": rnd.choice(["available", "not_available"]),
+            "price": float(rnd.randint(10, 1000)),
+            "currency": "UAH",
+            "status": "on_display",
+            "quantity_in_stock": rnd.randint(0, 10),
+            "in_stock": True,
+            "date_modified": "2024-01-01T00:00:00",
+        }
+        for product_id in range(1, count + 1)
+    ]
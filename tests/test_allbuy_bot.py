@@ -0,0 +1,313 @@
+import asyncio
+import datetime
+from dataclasses import asdict, replace
+
+import flatdict
+
+import src.exceptions as e
+from src.allbuy_bot import AllBuyBot, fingerprint
+from src.models.delivery_provider_data import DeliveryProviderData
+from src.models.order_status import OrderStatuses
+from src.prom.exceptions import OutdatedCookiesError, ScraperUnavailableError
+from src.retry_queue import RetryQueue
+from tests.helpers import order
+
+
+def tracked(date_modified, ts):
+    return {"id": "1", "date_modified": date_modified, "ts": str(ts)}
+
+
+def bot(**kwargs):
+    return AllBuyBot(client=None, **kwargs)
+
+
+def test_modified_from_is_newest_date_modified_between_sweeps():
+    now = datetime.datetime.now().timestamp()
+    orders = {
+        "1": tracked("2024-05-01T10:00:00.123456+03:00", now - 60),
+        "2": tracked("2024-05-02T08:30:15+03:00", now - 120),
+    }
+    interval = datetime.timedelta(hours=1)
+    assert bot(full_sweep_interval=interval).modified_from(orders) == "2024-05-02T08:30:15"
+
+
+def test_full_sweep_when_disabled_empty_stale_or_malformed():
+    now = datetime.datetime.now().timestamp()
+    interval = datetime.timedelta(hours=1)
+    fresh = {"1": tracked("2024-05-01T10:00:00", now)}
+
+    assert bot().modified_from(fresh) is None
+    assert bot(full_sweep_interval=interval).modified_from({}) is None
+    assert bot(full_sweep_interval=interval).modified_from(
+        {"1": tracked("2024-05-01T10:00:00", now - 7200)}
+    ) is None
+    assert bot(full_sweep_interval=interval).modified_from(
+        {"1": {"id": "1", "date_modified": "2024-05-01T10:00:00", "ts": ""}}
+    ) is None
+
+
+def test_fingerprint_tracks_decision_fields_and_age_bracket():
+    def fp(o, days):
+        return fingerprint(
+            flatdict.FlatDict(asdict(o), delimiter="."), datetime.timedelta(days=days)
+        )
+
+    base = order(1)
+    assert fp(base, 1) == fp(replace(base, date_modified="2024-02-02T00:00:00"), 2)
+    assert fp(base, 1) != fp(base, 8)
+    assert fp(base, 8) != fp(base, 61)
+    assert fp(base, 1) != fp(
+        replace(base, delivery_provider_data=DeliveryProviderData(unified_status="delivered")), 1
+    )
+
+
+def test_outdated_cookies_skip_only_the_affected_order():
+    allbuy_bot = bot()
+
+    async def refresh_order(order, initial=False):
+        if order.id == 1:
+            raise OutdatedCookiesError
+        return order
+
+    allbuy_bot.refresh_order = refresh_order
+
+    async def run():
+        for i in (1, 2):
+            await allbuy_bot.safe_refresh_order(order(i), initial=True)
+
+    asyncio.run(run())
+    assert allbuy_bot.cookies_outdated
+    assert allbuy_bot.retry_orders == {"1"}
+    assert allbuy_bot.outcomes == {"1": "OutdatedCookiesError", "2": "ok"}
+
+
+def test_unreachable_cabinet_keeps_orders_for_a_retry_without_outdating_cookies():
+    allbuy_bot = bot()
+
+    async def refresh_order(order, initial=False):
+        raise ScraperUnavailableError
+
+    allbuy_bot.refresh_order = refresh_order
+    asyncio.run(allbuy_bot.safe_refresh_order(order(1), initial=True))
+    assert not allbuy_bot.cookies_outdated
+    assert allbuy_bot.retry_orders == {"1"}
+
+
+class RetryClient:
+    def __init__(self, orders):
+        self.orders = orders
+
+    async def get_order(self, order_id):
+        if order_id == 5:
+            raise ConnectionError("unreachable")
+        return self.orders.get(order_id)
+
+
+def test_retry_due_tracks_recovered_orders_and_drops_stale_ones():
+    queue = RetryQueue()
+    for order_id in ("1", "2", "3", "5"):
+        queue.add(order_id, "GenerationDeclarationError", now=0)
+    queue.add("4", "GenerationDeclarationError", now=10 ** 10)
+
+    allbuy_bot = AllBuyBot(
+        client=RetryClient({
+            1: order(1),
+            2: order(2),
+            3: replace(order(3), status=OrderStatuses.CANCELED.value),
+        }),
+        retry_queue=queue,
+    )
+
+    async def preflight():
+        return True
+
+    async def refresh_order(o, initial=False):
+        if o.id == 2:
+            raise e.GenerationDeclarationError(o)
+        return o
+
+    allbuy_bot.director.preflight = preflight
+    allbuy_bot.refresh_order = refresh_order
+
+    assert asyncio.run(allbuy_bot.retry_due(now=100)) == 4
+    assert list(allbuy_bot.paid_orders) == ["1"]
+    assert allbuy_bot.paid_orders["1"]["outcome"] == "ok"
+    assert sorted(queue.entries) == ["2", "4", "5"]
+    assert queue.attempts("2") == 2
+    # A failed fetch is retried later without counting as an attempt.
+    assert queue.attempts("5") == 1
+    assert queue.entries["5"]["due"] > 100
+
+
+class BatchManager:
+    def __init__(self):
+        self.batches = []
+
+    async def cancellation_hooks(self, orders, now=None):
+        self.batches.append(([o.id for o in orders], now))
+        return list(orders)
+
+
+class TrackedClient:
+    def __init__(self, orders):
+        self.orders = {o.id: o for o in orders}
+
+    async def iter_orders(self, status=None, last_modified_from=None, **kwargs):
+        for o in self.orders.values():
+            if status is not None and o.status != status:
+                continue
+            if last_modified_from and o.date_modified < last_modified_from:
+                continue
+            yield o
+
+    async def get_order(self, order_id):
+        return self.orders.get(order_id)
+
+
+def test_incremental_refresh_refetches_retry_rows_and_prunes_left_orders():
+    now = datetime.datetime.now().timestamp()
+    paid = OrderStatuses.PAID.value
+    prom_orders = [
+        # Kept for a retry, but older than the watermark.
+        replace(order(1), date_modified="2024-05-01T10:00:00"),
+        replace(order(2), date_modified="2024-05-02T10:00:00"),
+        # Pending before, delivered since.
+        replace(order(3), status=OrderStatuses.DELIVERED.value, date_modified="2024-05-03T10:00:00"),
+    ]
+    allbuy_bot = AllBuyBot(
+        client=TrackedClient(prom_orders),
+        full_sweep_interval=datetime.timedelta(hours=1),
+        paid_orders={
+            "1": tracked("2024-05-01T10:00:00", now) | {"retry": "TRUE"},
+            "2": tracked("2024-05-02T10:00:00", now),
+            "4": tracked("2024-05-01T09:00:00", now),
+        },
+        pending_orders={"3": tracked("2024-05-01T10:00:00", now)},
+    )
+    refreshed = []
+
+    async def preflight():
+        return True
+
+    async def refresh_order(o, initial=False):
+        refreshed.append((o.id, initial))
+        assert o.status == paid
+        return o
+
+    manager = BatchManager()
+    allbuy_bot.director.preflight = preflight
+    allbuy_bot.director.assign = lambda o: manager
+    allbuy_bot.refresh_order = refresh_order
+
+    asyncio.run(allbuy_bot.refresh_shop(orders=None))
+
+    assert refreshed == [(1, True)]
+    assert [ids for ids, _ in manager.batches] == [[2]]
+    assert sorted(allbuy_bot.paid_orders) == ["1", "2", "4"]
+    assert not allbuy_bot.paid_orders["1"].get("retry")
+    assert allbuy_bot.pending_orders == {}
+
+
+def test_dropped_orders_stay_tracked_for_a_retry():
+    allbuy_bot = AllBuyBot(client=TrackedClient([order(1), order(2)]))
+
+    async def refresh_order(o, initial=False):
+        if o.id == 1:
+            raise OutdatedCookiesError
+        return o
+
+    allbuy_bot.refresh_order = refresh_order
+
+    async def run():
+        return await allbuy_bot.refresh_tracked_orders(
+            allbuy_bot.client.iter_orders(), {}, [], status=OrderStatuses.PAID.value,
+        )
+
+    tracked_orders = asyncio.run(run())
+    assert tracked_orders["1"]["retry"] is True
+    assert not tracked_orders["2"].get("retry")
+
+
+def test_retry_rows_wait_for_their_backoff():
+    queue = RetryQueue()
+    queue.add("1", "GenerationDeclarationError")
+    allbuy_bot = AllBuyBot(client=TrackedClient([order(1)]), retry_queue=queue)
+    row = {"id": "1", "ts": "0", "retry": "TRUE"}
+
+    async def refresh_order(o, initial=False):
+        raise AssertionError("the retry is not due yet")
+
+    allbuy_bot.refresh_order = refresh_order
+
+    async def run():
+        return await allbuy_bot.refresh_tracked_orders(
+            allbuy_bot.client.iter_orders(), {"1": row}, [], status=OrderStatuses.PAID.value,
+        )
+
+    tracked_orders = asyncio.run(run())
+    assert tracked_orders["1"]["retry"]
+    assert queue.attempts("1") == 1
+
+
+def test_dead_lettered_orders_run_api_rules_and_are_pruned_once_untracked():
+    queue = RetryQueue(max_attempts=1)
+    queue.add("1", "GenerationDeclarationError", now=0)
+    queue.add("2", "GenerationDeclarationError", now=0)
+    allbuy_bot = AllBuyBot(client=TrackedClient([order(1)]), retry_queue=queue)
+    refreshed = []
+
+    async def preflight():
+        return True
+
+    async def refresh_order(o, initial=False):
+        refreshed.append((o.id, initial))
+        return o
+
+    manager = BatchManager()
+    allbuy_bot.director.preflight = preflight
+    allbuy_bot.director.assign = lambda o: manager
+    allbuy_bot.refresh_order = refresh_order
+
+    asyncio.run(allbuy_bot.refresh_shop(orders=None))
+
+    assert refreshed == []
+    assert [ids for ids, _ in manager.batches] == [[1]]
+    assert list(allbuy_bot.paid_orders) == ["1"]
+    assert queue.is_dead("1")
+    assert "2" not in queue
+
+
+def test_known_orders_are_checked_in_one_batch():
+    received = [replace(order(i), status=OrderStatuses.RECEIVED.value) for i in (1, 2, 3)]
+    allbuy_bot = AllBuyBot(client=TrackedClient(received))
+    manager = BatchManager()
+
+    async def preflight():
+        return True
+
+    async def refresh_order(o, initial=False):
+        raise AssertionError("known orders are refreshed in a batch")
+
+    allbuy_bot.director.preflight = preflight
+    allbuy_bot.director.assign = lambda o: manager
+    allbuy_bot.refresh_order = refresh_order
+    # Left over from an earlier run.
+    allbuy_bot.outcomes = {"99": "ok"}
+
+    asyncio.run(allbuy_bot.refresh_shop(orders=None))
+
+    [(ids, now)] = manager.batches
+    assert ids == [1, 2, 3] and now is not None
+    assert allbuy_bot.outcomes == {"1": "ok", "2": "ok", "3": "ok"}
+
+
+def test_orders_prom_did_not_update_are_queued_for_a_retry():
+    allbuy_bot = bot()
+
+    async def run():
+        await allbuy_bot.safe_refresh_order(order(1), result=e.StatusNotUpdatedError(order(1)))
+
+    asyncio.run(run())
+    assert allbuy_bot.outcomes == {"1": "StatusNotUpdatedError"}
+    assert allbuy_bot.retry_orders == {"1"}
+    assert allbuy_bot.retry_queue.attempts("1") == 1
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+
+from aiohttp import web
+
+from src.prom.cache import ResponseCache
+from src.prom.client import PromAPIClient
+from tests.helpers import serve
+
+
+def test_cache_expires_entries_after_ttl(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    key = ResponseCache.key("GET", "products/list", {"limit": 100})
+    cache.set(key, {"products": [{"id": 1}]})
+    assert cache.get(key) == {"products": [{"id": 1}]}
+
+    stored = time.time() - 61
+    os.utime(cache.path(key), (stored, stored))
+    assert cache.get(key) is None
+    assert not os.path.exists(cache.path(key))
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=350)
+    payload = {"data": "x" * 90}
+    for i, key in enumerate("abc"):
+        cache.set(key, payload)
+        os.utime(cache.path(key), (1000 + i, time.time()))
+    # "a" is the oldest, but reading it makes "b" the least recently used.
+    assert cache.get("a") == payload
+    cache.set("d", payload)
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("d") == payload
+
+
+def test_client_serves_cached_pages_and_bypass_refreshes(tmp_path):
+    requests = []
+
+    async def handler(request):
+        requests.append(request.path)
+        last_id = int(request.query.get("last_id", 0))
+        products = [{"id": i} for i in range(last_id + 1, min(last_id + 101, 251))]
+        return web.json_response({"products": products})
+
+    async def run(cache):
+        server = await serve(handler)
+        client = PromAPIClient("token", base_url=str(server.make_url("/api/v1/")), cache=cache)
+        try:
+            return len(await client.get_products())
+        finally:
+            await client.close()
+            await server.close()
+
+    assert asyncio.run(run(ResponseCache(str(tmp_path)))) == 250
+    assert len(requests) == 4
+    assert asyncio.run(run(ResponseCache(str(tmp_path)))) == 250
+    assert len(requests) == 4
+    assert asyncio.run(run(ResponseCache(str(tmp_path), bypass=True))) == 250
+    assert len(requests) == 8
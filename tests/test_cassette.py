@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from benchmarks.cassette import REDACTED, CassetteServer, load
+
+
+def test_cassette_records_redacted_and_replays(tmp_path):
+    cassette = str(tmp_path / "run.json.gz")
+
+    async def auth_info(request):
+        return web.json_response({"id": 42, "csrf_token": "secret-csrf"})
+
+    async def set_status(request):
+        body = await request.json()
+        return web.json_response({"processed_ids": body["ids"]})
+
+    async def exchange(url):
+        async with aiohttp.ClientSession(
+            base_url=url, headers={"Authorization": "Bearer secret-token"},
+        ) as session:
+            async with session.get("/remote/auth/info", params={"token": "t"}) as resp:
+                auth = await resp.json()
+            async with session.post("/api/v1/orders/set_status", json={"ids": [1]}) as resp:
+                first = await resp.json()
+            async with session.post("/api/v1/orders/set_status", json={"ids": [2]}) as resp:
+                second = await resp.json()
+            async with session.get("/never/recorded") as resp:
+                missing = resp.status
+        return auth, first, second, missing
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/remote/auth/info", auth_info)
+        app.router.add_post("/api/v1/orders/set_status", set_status)
+        upstream = TestServer(app)
+        await upstream.start_server()
+
+        recorder = CassetteServer(
+            cassette, mode="record", upstream=str(upstream.make_url("/")),
+        )
+        try:
+            recorded = await exchange(await recorder.start())
+        finally:
+            await recorder.stop()
+            await upstream.close()
+
+        player = CassetteServer(cassette)
+        try:
+            replayed = await exchange(await player.start())
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{player.url}/not/in/cassette") as resp:
+                    assert resp.status == 404
+        finally:
+            await player.stop()
+        return recorded, replayed, player.misses
+
+    recorded, replayed, misses = asyncio.run(run())
+    # The client still sees the real response while recording.
+    assert recorded[0]["csrf_token"] == "secret-csrf"
+    assert replayed[0] == {"id": 42, "csrf_token": REDACTED}
+    assert replayed[1:3] == ({"processed_ids": [1]}, {"processed_ids": [2]})
+    # Upstream's own 404 was recorded; only the new path is a miss.
+    assert replayed[3] == 404
+    assert misses == ["GET /not/in/cassette"]
+
+    with gzip.open(cassette, "rt") as file:
+        raw = file.read()
+    assert "secret" not in raw
+    assert len(load(cassette)) == 4
@@ -0,0 +1,25 @@
+import importlib.util
+
+import pytest
+
+from src import codec
+
+
+@pytest.mark.parametrize("backend", codec.BACKENDS)
+def test_codec_backends_round_trip(backend):
+    pytest.importorskip(backend)
+    selected = codec.backend
+    payload = {"orders": [{"id": 1, "price": 12.5, "name": "Товар", "notes": None}]}
+    try:
+        codec.use(backend)
+        text = codec.dumps(payload)
+        assert isinstance(text, str)
+        assert codec.loads(text) == payload
+        assert codec.loads(text.encode("utf-8")) == payload
+    finally:
+        codec.use(selected)
+
+
+def test_codec_prefers_fastest_available_backend():
+    expected = next(name for name in codec.BACKENDS if importlib.util.find_spec(name))
+    assert codec.backend == expected
@@ -0,0 +1,66 @@
+import datetime
+from dataclasses import asdict
+
+import dacite
+import pytest
+
+from src.models.utils import state_dict
+from src.models.decoders import TYPE_HOOKS, decoder
+from src.models.order import Order
+from src.models.payment_status import PaymentStatuses
+from src.models.product import Product
+from tests.helpers import synthetic_orders, synthetic_products
+
+
+def test_decoders_match_dacite():
+    config = dacite.Config(type_hooks=TYPE_HOOKS)
+    for cls, records in ((Order, synthetic_orders(200)), (Product, synthetic_products(50))):
+        decode = decoder(cls)
+        for record in records:
+            assert (
+                asdict(decode(record), dict_factory=state_dict) ==
+                asdict(dacite.from_dict(cls, record, config=config), dict_factory=state_dict)
+            )
+
+
+def test_decoder_applies_hooks_defaults_and_is_cached():
+    [record] = synthetic_orders(1)
+    record["payment_data"] = {"type": "prom", "status": "something_new"}
+    del record["client_notes"]
+
+    order = decoder(Order)(record)
+    assert order.payment_data.status == PaymentStatuses.UNDEFINED.value
+    assert order.client_notes is None
+    assert order.client.phone == record["phone"]
+    assert decoder(Order) is decoder(Order)
+
+    del record["status"]
+    with pytest.raises(KeyError):
+        decoder(Order)(record)
+
+
+def test_repeated_values_are_shared_and_dates_parsed_once():
+    first, second = map(decoder(Order), synthetic_orders(2))
+    assert first.delivery_option is decoder(Order)(synthetic_orders(1)[0]).delivery_option
+    assert first.status is second.status
+    assert first.datetime_created is first.datetime_created
+    assert first.age > datetime.timedelta(0)
+    assert "_datetime_created" not in asdict(first, dict_factory=state_dict)
+
+    product = decoder(Product)(synthetic_products(1)[0])
+    assert product.datetime_modified == datetime.datetime(2024, 1, 1)
+    assert not hasattr(product, "__dict__")
+
+
+def test_missing_optional_fields_decode_as_none():
+    [record] = synthetic_orders(1)
+    del record["delivery_option"]
+    record["payment_data"] = {}
+    order = decoder(Order)(record)
+    assert order.delivery_option is None
+    assert order.payment_data.type is None
+    assert order.payment_data.status is None
+
+    [record] = synthetic_orders(1)
+    del record["delivery_option"]["comment"]
+    assert decoder(Order)(record).delivery_option.comment is None
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from src.executor import OrderExecutor
+from src.models.delivery_provider import DeliveryProviders
+from tests.helpers import order
+
+
+def run_tracking(executor, orders):
+    running = {"total": 0, "peak": 0, "per_provider": {}, "provider_peak": {}}
+
+    async def func(o):
+        key = o.delivery_option.id if o.delivery_option else None
+        running["total"] += 1
+        running["per_provider"][key] = running["per_provider"].get(key, 0) + 1
+        running["peak"] = max(running["peak"], running["total"])
+        running["provider_peak"][key] = max(
+            running["provider_peak"].get(key, 0), running["per_provider"][key]
+        )
+        await asyncio.sleep(0.01)
+        running["total"] -= 1
+        running["per_provider"][key] -= 1
+        return o.id
+
+    result = asyncio.run(executor.map(orders, func))
+    return result, running
+
+
+def test_sequential_by_default_and_preserves_order():
+    orders = [order(i) for i in range(5)]
+    result, running = run_tracking(OrderExecutor(), orders)
+    assert result == [0, 1, 2, 3, 4]
+    assert running["peak"] == 1
+
+
+def test_global_and_provider_limits_are_respected():
+    np_id = DeliveryProviders.NOVA_POSHTA.value.id
+    orders = [order(i) for i in range(6)]
+    orders += [order(i, DeliveryProviders.PICKUP) for i in range(6, 12)]
+
+    executor = OrderExecutor(concurrency=4, provider_concurrency={np_id: 1})
+    result, running = run_tracking(executor, orders)
+
+    assert result == list(range(12))
+    assert running["peak"] <= 4
+    assert running["provider_peak"][np_id] == 1
+
+
+def test_accepts_async_iterables():
+    async def produce():
+        for i in range(3):
+            yield order(i)
+
+    result, _ = run_tracking(OrderExecutor(concurrency=2), produce())
+    assert result == [0, 1, 2]
+
+
+def test_first_failure_stops_scheduling_and_propagates():
+    seen = []
+
+    async def func(o):
+        seen.append(o.id)
+        if o.id == 1:
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(OrderExecutor().map([order(i) for i in range(5)], func))
+    assert seen == [0, 1]
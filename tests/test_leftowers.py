@@ -1,4 +1,6 @@
-from leftowers import normalize_sku, plan_updates
+import asyncio
+
+from leftowers import normalize_sku, plan_updates, stream_updates
 from src.models.product import Product
 
 
@@ -102,3 +104,19 @@ def test_normalize_sku():
     assert normalize_sku("TC-7635") == "TC-7635"
     assert normalize_sku(None) is None
     assert normalize_sku("") == ""
+
+
+def test_stream_updates_plans_a_streamed_catalog():
+    products = [prom("TC-7635", presence="not_available"), prom("XX-9999", id=2)]
+
+    async def catalog():
+        for product in products:
+            yield product
+
+    updates, unknown = asyncio.run(stream_updates(
+        catalog(),
+        stock_products=[stock("TC-7635", quantity=35)],
+        intertool_products=[],
+    ))
+    assert [(old.id, new.presence) for old, new in updates] == [(1, "available")]
+    assert unknown == [products[1]]
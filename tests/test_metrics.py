@@ -0,0 +1,39 @@
+import pytest
+
+from src.metrics import Registry
+
+
+def test_render_histogram_and_counter_in_prometheus_text_format():
+    registry = Registry(buckets=(0.1, 1.0))
+    registry.observe("get_orders", 0.05)
+    registry.observe("get_orders", 0.5)
+    registry.inc(provider="nova_poshta", outcome="ModifiedDateIsTooOldError", value=2)
+
+    text = registry.render()
+
+    labels = 'stage="get_orders",provider="",outcome="ok"'
+    assert f'allbuy_stage_duration_seconds_bucket{{{labels},le="0.1"}} 1' in text
+    assert f'allbuy_stage_duration_seconds_bucket{{{labels},le="1.0"}} 2' in text
+    assert f'allbuy_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"allbuy_stage_duration_seconds_count{{{labels}}} 2" in text
+    assert (
+        'allbuy_orders_total{provider="nova_poshta",outcome="ModifiedDateIsTooOldError"} 2'
+        in text
+    )
+
+
+def test_timer_labels_outcome_with_exception_class():
+    registry = Registry()
+    with pytest.raises(KeyError):
+        with registry.timer("process_order", provider="meest"):
+            raise KeyError("x")
+
+    assert list(registry.histograms) == [("process_order", "meest", "KeyError")]
+
+
+def test_write_textfile(tmp_path):
+    registry = Registry()
+    registry.inc()
+    path = tmp_path / "allbuy.prom"
+    registry.write_textfile(str(path))
+    assert path.read_text() == registry.render()
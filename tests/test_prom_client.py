@@ -0,0 +1,233 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from src.models.order_status import OrderStatuses
+from src.models.product import Product
+from src.prom.batcher import StatusBatcher
+from src.prom.client import PromAPIClient
+from src.prom.exceptions import PromAPIError
+from src.prom.ratelimit import retry_after
+from tests.helpers import order, serve
+
+
+class PagedPromAPIClient(PromAPIClient):
+    def __init__(self, ids, **kwargs):
+        super().__init__("token", **kwargs)
+        self.ids = sorted(ids, reverse=True)
+        self.requests = []
+
+    async def get_orders(self, status=None, date_to=None, last_id=None, limit=100, **kwargs):
+        self.requests.append(last_id)
+        ids = [i for i in self.ids if last_id is None or i < last_id]
+        return [order(i) for i in ids[:limit]]
+
+
+def test_iter_orders_walks_all_pages_with_last_id_cursor():
+    async def run():
+        client = PagedPromAPIClient(range(1, 251))
+        try:
+            ids = [o.id async for o in client.iter_orders(OrderStatuses.PAID.value)]
+        finally:
+            await client.client.close()
+        return ids, client.requests
+
+    ids, requests = asyncio.run(run())
+    assert ids == list(range(250, 0, -1))
+    assert requests == [None, 151, 51, 1]
+
+
+def test_iter_orders_stops_prefetching_when_consumer_stops():
+    async def run():
+        client = PagedPromAPIClient(range(1, 1001))
+        try:
+            async for o in client.iter_orders():
+                if o.id == 950:
+                    break
+            await asyncio.sleep(0)
+        finally:
+            await client.client.close()
+        return client.requests
+
+    # Only the first page and the prefetched second page were requested.
+    assert asyncio.run(run()) == [None, 901]
+
+
+def test_request_retries_throttling_and_server_errors():
+    statuses = [429, 503, 200]
+
+    async def handler(request):
+        status = statuses.pop(0)
+        if status != 200:
+            return web.json_response({}, status=status, headers={"Retry-After": "0"})
+        return web.json_response({"orders": []})
+
+    async def run():
+        server = await serve(handler)
+        client = PromAPIClient("token", base_url=str(server.make_url("/api/v1/")))
+        try:
+            orders = await client.get_orders()
+            rate = client.limiters["orders"].rate
+        finally:
+            await client.close()
+            await server.close()
+        return orders, rate
+
+    orders, rate = asyncio.run(run())
+    assert orders == []
+    assert statuses == []
+    # Throttled once, then recovered a little on success.
+    assert 5 < rate < 10
+
+
+def test_request_gives_up_after_max_retries():
+    async def handler(request):
+        return web.json_response({}, status=500, headers={"Retry-After": "0"})
+
+    async def run():
+        server = await serve(handler)
+        client = PromAPIClient(
+            "token", base_url=str(server.make_url("/api/v1/")), max_retries=2,
+        )
+        try:
+            await client.set_order_status(order(1), OrderStatuses.RECEIVED.value)
+        finally:
+            await client.close()
+            await server.close()
+
+    with pytest.raises(PromAPIError) as exc_info:
+        asyncio.run(run())
+    assert exc_info.value.status == 500
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert retry_after("3") == 3.0
+    assert retry_after(None) is None
+    assert retry_after("garbage") is None
+    assert retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_status_changes_are_coalesced_by_status_and_reason():
+    bodies = []
+
+    async def handler(request):
+        body = await request.json()
+        bodies.append(body)
+        # Order 3 is rejected by Prom.
+        return web.json_response({"processed_ids": [i for i in body["ids"] if i != 3]})
+
+    async def run():
+        server = await serve(handler)
+        client = PromAPIClient(
+            "token", base_url=str(server.make_url("/api/v1/")), status_batch_window=0.01,
+        )
+        try:
+            return await asyncio.gather(
+                client.set_order_status(order(1), OrderStatuses.DELIVERED.value),
+                client.set_order_status(order(2), OrderStatuses.DELIVERED.value),
+                client.set_order_status(order(3), OrderStatuses.DELIVERED.value),
+                client.set_order_status(
+                    order(4), OrderStatuses.CANCELED.value, cancellation_reason="not_available",
+                ),
+            )
+        finally:
+            await client.close()
+            await server.close()
+
+    results = asyncio.run(run())
+    assert sorted((b["status"], tuple(b["ids"])) for b in bodies) == [
+        ("canceled", (4,)),
+        ("delivered", (1, 2, 3)),
+    ]
+    assert [r["processed_ids"] for r in results] == [[1], [2], [], [4]]
+
+
+def test_status_batches_are_split_into_chunks():
+    class Client:
+        def __init__(self):
+            self.requests = []
+
+        async def set_orders_status(self, orders, status, **kwargs):
+            ids = [o.id for o in orders]
+            self.requests.append(ids)
+            return {"processed_ids": ids}
+
+    async def run():
+        batcher = StatusBatcher(Client(), window=0.01, chunk_size=2)
+        results = await asyncio.gather(*(
+            batcher.set_order_status(order(i), OrderStatuses.DELIVERED.value)
+            for i in range(1, 8)
+        ))
+        return batcher.client.requests, results
+
+    requests, results = asyncio.run(run())
+    assert sorted(requests) == [[1, 2], [3, 4], [5, 6], [7]]
+    assert [r["processed_ids"] for r in results] == [[i] for i in range(1, 8)]
+
+
+class CatalogPromAPIClient(PromAPIClient):
+    def __init__(self, count, **kwargs):
+        super().__init__("token", **kwargs)
+        self.count = count
+        self.requests = []
+
+    async def get_product_page(self, last_id=None, limit=100):
+        self.requests.append(last_id)
+        start = (last_id or 0) + 1
+        return [
+            {"id": i, "sku": f"SKU-{i}"} for i in range(start, min(start + limit, self.count + 1))
+        ]
+
+
+def test_iter_products_streams_catalog_with_bounded_prefetch():
+    async def run():
+        client = CatalogPromAPIClient(1000)
+        try:
+            ids = [p.id async for p in client.iter_products(limit=100)]
+            seen = client.requests
+            client.requests = []
+            async for _ in client.iter_products(limit=100, max_pages=1):
+                # Consumer stalls on the first product; the pump must stop.
+                await asyncio.sleep(0.01)
+                break
+        finally:
+            await client.client.close()
+        return ids, seen, client.requests
+
+    ids, seen, stalled = asyncio.run(run())
+    assert ids == list(range(1, 1001))
+    assert seen == [None, 100, 200, 300, 400, 500, 600, 700, 800, 900, 1000]
+    assert len(stalled) <= 3
+
+
+def test_edit_products_reports_partial_failures_per_product():
+    async def handler(request):
+        body = await request.json()
+        ids = [product["id"] for product in body]
+        if 5 in ids:
+            return web.json_response({}, status=500, headers={"Retry-After": "0"})
+        return web.json_response({
+            "processed_ids": [i for i in ids if i != 2],
+            "errors": {"2": "Invalid price", "n/a": "Unknown product"} if 2 in ids else {},
+        })
+
+    async def run():
+        server = await serve(handler)
+        client = PromAPIClient(
+            "token", base_url=str(server.make_url("/api/v1/")), max_retries=0,
+        )
+        try:
+            return await client.edit_products(
+                [Product(id=i, price=10.0) for i in range(1, 8)], chunk_size=3, concurrency=2,
+            )
+        finally:
+            await client.close()
+            await server.close()
+
+    report = asyncio.run(run())
+    assert sorted(report.processed_ids) == [1, 3, 7]
+    assert report.errors[2] == "Invalid price"
+    assert sorted(report.errors) == [2, 4, 5, 6]
+    assert report.errors[4].startswith("PromAPIError")
+    assert not report.ok
@@ -0,0 +1,55 @@
+import asyncio
+import subprocess
+import sys
+
+from src.models.delivery_provider import DeliveryProvider, DeliveryProviders
+from src.prom.client import PromAPIClient
+from src.prom.managers import registry
+from src.prom.managers.director import Director
+from src.prom.managers.dummy import DummyManager
+from src.prom.managers.pickup import PickupManager
+from tests.helpers import order
+
+
+def test_registered_provider_gets_its_manager():
+    async def run():
+        director = Director(api_client=PromAPIClient("token"))
+        manager = director.assign(order(1, DeliveryProviders.PICKUP))
+        assert isinstance(manager, PickupManager)
+        assert director.assign(order(2, DeliveryProviders.PICKUP)) is manager
+        await director.api_client.close()
+
+    asyncio.run(run())
+
+
+def test_unknown_provider_falls_back_to_dummy_manager():
+    async def run():
+        director = Director(api_client=PromAPIClient("token"))
+        for i, provider in enumerate([DeliveryProviders.JUSTIN, None]):
+            manager = director.assign(order(i, provider))
+            assert type(manager) is DummyManager
+            assert manager.scrape_client is None
+        await director.api_client.close()
+
+    asyncio.run(run())
+
+
+def test_register_new_provider(monkeypatch):
+    monkeypatch.setattr(registry, "REGISTRY", dict(registry.REGISTRY))
+    provider = DeliveryProvider(id=1, name="Test", comment=None)
+    registry.register(provider, manager="src.prom.managers.pickup:PickupManager")
+
+    entry = registry.lookup(1)
+    assert registry.load(entry.manager) is PickupManager
+    assert entry.scraper is None
+
+
+def test_director_import_does_not_load_scrapers():
+    code = (
+        "import sys; import src.prom.managers.director; "
+        "print(any(name.startswith('src.prom.remote.meest') for name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,33 @@
+from src.retry_queue import RetryQueue
+
+
+def test_retry_queue_backs_off_and_dead_letters():
+    queue = RetryQueue(max_attempts=3, base_delay=10, max_delay=15)
+
+    assert not queue.add("1", "GenerationDeclarationError", now=100)
+    assert queue.due(now=109) == []
+    assert queue.is_waiting("1", now=109)
+    assert queue.due(now=110) == ["1"]
+    assert not queue.is_waiting("1", now=110)
+
+    assert not queue.add("1", "GenerationDeclarationError", now=110)
+    assert queue.entries["1"]["due"] == 125  # 20 s capped at max_delay
+
+    assert queue.add("1", "GenerationDeclarationError", now=125)
+    assert queue.is_dead("1")
+    assert not queue.is_waiting("1", now=0)
+    assert queue.due(now=10 ** 10) == []
+
+    queue.remove("1")
+    assert "1" not in queue
+
+
+def test_retry_queue_loads_rows_read_back_from_the_sheet():
+    queue = RetryQueue({
+        "1": {"id": "1", "attempts": "2", "due": "50.5", "error": "E", "state": "pending"},
+        "2": {"id": "2", "attempts": "5", "due": "10", "error": "E", "state": "dead"},
+        "3": {"id": "3", "attempts": "", "due": ""},
+    })
+    assert len(queue) == 2
+    assert queue.attempts("1") == 2
+    assert queue.due(now=60) == ["1"]
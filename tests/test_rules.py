@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+from dataclasses import replace
+
+import pytest
+
+import src.exceptions as e
+from src.models.delivery_provider import DeliveryProviders
+from src.models.delivery_provider_data import DeliveryProviderData
+from src.models.order_status import OrderStatuses
+from src.models.payment_data import PaymentData
+from src.models.payment_option import PaymentOptions
+from src.models.payment_status import PaymentStatuses
+from src.prom.managers import rules
+from src.prom.managers.dummy import DummyManager
+from tests.helpers import order
+
+
+# order() is created on 2024-01-01.
+FRESH = datetime.datetime(2024, 1, 3)
+STALE = datetime.datetime(2024, 1, 20)
+OLD = datetime.datetime(2024, 6, 1)
+
+
+def received(i, delivery_status=None, **kwargs):
+    return replace(
+        order(i, kwargs.pop("provider", DeliveryProviders.NOVA_POSHTA)),
+        status=OrderStatuses.RECEIVED.value,
+        delivery_provider_data=DeliveryProviderData(unified_status=delivery_status),
+        **kwargs,
+    )
+
+
+def pending(i, payment_option=PaymentOptions.PROM):
+    return replace(
+        order(i), status=OrderStatuses.PENDING.value, payment_option=payment_option.value,
+    )
+
+
+def test_rules_decide_per_order():
+    refunded = replace(
+        order(4), payment_data=PaymentData(type=None, status=PaymentStatuses.REFUNDED.value),
+    )
+    cases = [
+        (received(1, "delivered"), FRESH, rules.FINALIZE, "delivered"),
+        (received(2, "delivered", provider=DeliveryProviders.ROZETKA), FRESH, rules.REJECT, None),
+        (received(3, "returned"), OLD, rules.CANCEL, "returned"),
+        (refunded, OLD, rules.CANCEL, "refunded"),
+        (pending(5), OLD, rules.CANCEL, "payment_not_received"),
+        (pending(6), FRESH, rules.REJECT, "awaiting_payment"),
+        (received(7, "delivered_cash_received"), FRESH, rules.FINALIZE, "cash_received"),
+        (order(8), STALE, rules.REJECT, "outdated"),
+        (order(9), FRESH, rules.IGNORE, None),
+    ]
+    for o, now, action, rule in cases:
+        decision, = rules.evaluate([o], now=now)
+        assert decision.action == action, o.id
+        if rule:
+            assert decision.rule == rule, o.id
+
+    decision, = rules.evaluate([received(3, "returned")], now=OLD)
+    assert decision.cancellation_reason == "another"
+    assert decision.cancellation_text == "Повернуте відправникові"
+
+    assert rules.evaluate([pending(6)], now=FRESH)[0].error is e.IncompletePaymentError
+    assert rules.evaluate([received(2)], now=FRESH)[0].error is e.UnknownFinalizationError
+
+
+def test_batch_uses_one_now_snapshot():
+    orders = [order(1), replace(order(2), date_created="2023-12-01T10:00:00")]
+    now = datetime.datetime(2024, 1, 5)
+    assert [d.action for d in rules.evaluate(orders, now=now)] == [rules.IGNORE, rules.REJECT]
+
+
+class FakeAPI:
+    def __init__(self):
+        self.calls = []
+
+    async def set_order_status(self, order, status, **kwargs):
+        self.calls.append(([order.id], status.name, kwargs))
+        return {"processed_ids": [order.id]}
+
+    async def set_orders_status(self, orders, status, **kwargs):
+        self.calls.append(([o.id for o in orders], status.name, kwargs))
+        return {"processed_ids": [o.id for o in orders]}
+
+
+def test_cancellation_hooks_batch_status_calls():
+    api = FakeAPI()
+    manager = DummyManager(api_client=api)
+    orders = [received(1, "delivered"), pending(2), received(3, "delivered"), received(4)]
+
+    results = asyncio.run(manager.cancellation_hooks(orders, now=FRESH))
+
+    assert api.calls == [
+        ([1, 3], "delivered", {"cancellation_reason": None, "cancellation_text": None}),
+    ]
+    assert results[0].status == OrderStatuses.DELIVERED.value
+    assert isinstance(results[1], e.IncompletePaymentError)
+    assert isinstance(results[3], e.UnknownFinalizationError)
+
+    with pytest.raises(e.IncompletePaymentError):
+        today = datetime.datetime.now().isoformat()
+        asyncio.run(manager.cancellation_hook(replace(pending(2), date_created=today)))
+
+
+def test_cancellation_hooks_only_update_processed_orders():
+    class PartialAPI(FakeAPI):
+        async def set_orders_status(self, orders, status, **kwargs):
+            await super().set_orders_status(orders, status, **kwargs)
+            return {"processed_ids": [o.id for o in orders if o.id != 3]}
+
+    notified = []
+
+    class Messenger:
+        async def send(self, message, **kwargs):
+            notified.append(message)
+
+    manager = DummyManager(api_client=PartialAPI(), messenger=Messenger())
+    orders = [received(1, "delivered"), received(3, "delivered")]
+
+    results = asyncio.run(manager.cancellation_hooks(orders, now=FRESH))
+
+    assert results[0].status == OrderStatuses.DELIVERED.value
+    assert isinstance(results[1], e.StatusNotUpdatedError)
+    assert len(notified) == 1
@@ -0,0 +1,201 @@
+import asyncio
+from functools import partial
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.models.delivery_provider import DeliveryProviders
+from src.prom.client import PromAPIClient
+from src.prom.exceptions import OutdatedCookiesError, ScraperUnavailableError
+from src.prom.managers.director import Director
+from src.prom.remote.meest import MeestScraperClient
+from src.prom.remote.session import ScraperSession
+from src.prom.remote.steps import run_steps
+from tests.helpers import CSRF_TOKEN, fake_cookies, order
+
+
+def test_director_scrapers_share_one_session_and_cookie_jar():
+    async def run():
+        director = Director(api_client=PromAPIClient("token"), cookies=fake_cookies())
+        try:
+            scrapers = [
+                director.assign(order(i, provider)).scrape_client
+                for i, provider in enumerate([
+                    DeliveryProviders.NOVA_POSHTA, DeliveryProviders.UKR_POSHTA,
+                    DeliveryProviders.ROZETKA, DeliveryProviders.MEEST,
+                ])
+            ]
+            clients = {id(scraper.client) for scraper in scrapers}
+            headers = scrapers[0].post_headers(order_id=1, owner_id=2)
+        finally:
+            await director.close()
+            await director.api_client.close()
+        return clients, headers
+
+    clients, headers = asyncio.run(run())
+    assert len(clients) == 1
+    assert headers["x-csrftoken"] == CSRF_TOKEN
+
+
+def test_outdated_cookies_clear_the_shared_jar():
+    async def login_page(request):
+        return web.Response(text="<html>login</html>", content_type="text/html")
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/remote/auth/info", login_page)
+        server = TestServer(app)
+        await server.start_server()
+        director = Director(
+            api_client=PromAPIClient("token"),
+            cookies=fake_cookies(),
+            scraper_base_url=str(server.make_url("/")),
+        )
+        try:
+            nova_poshta = director.assign(order(1)).scrape_client
+            meest = director.assign(order(2, DeliveryProviders.MEEST)).scrape_client
+            with pytest.raises(OutdatedCookiesError):
+                await nova_poshta.get_auth()
+            return len(meest.client.cookie_jar)
+        finally:
+            await director.close()
+            await director.api_client.close()
+            await server.close()
+
+    assert asyncio.run(run()) == 0
+
+
+def test_updated_cookies_rebuild_the_scraper_session():
+    async def run():
+        director = Director(api_client=PromAPIClient("token"), cookies=fake_cookies())
+        try:
+            old = director.assign(order(1)).scrape_client
+            await director.update_cookies(fake_cookies())
+            new = director.assign(order(2)).scrape_client
+            assert old.client.closed
+            assert new.session is director.scraper_session is not old.session
+        finally:
+            await director.close()
+            await director.api_client.close()
+
+    asyncio.run(run())
+
+
+def test_auth_info_is_cached_and_outdated_cookies_invalidate_the_session():
+    requests = []
+    outdated = False
+
+    async def auth_info(request):
+        requests.append(request.path)
+        if outdated:
+            return web.Response(text="<html>login</html>", content_type="text/html")
+        return web.json_response({"id": 42})
+
+    async def get_order(request):
+        if outdated:
+            return web.Response(text="<html>login</html>", content_type="text/html")
+        return web.json_response({"order": {"id": 1}})
+
+    async def run():
+        nonlocal outdated
+        app = web.Application()
+        app.router.add_get("/remote/auth/info", auth_info)
+        app.router.add_get("/remote/order_api/get_order", get_order)
+        server = TestServer(app)
+        await server.start_server()
+        session = ScraperSession(base_url=str(server.make_url("/")))
+        scraper = MeestScraperClient(session=session)
+        try:
+            results = await asyncio.gather(*(scraper.get_auth() for _ in range(5)))
+            await scraper.get_order(order(1))
+            assert len(requests) == 1
+
+            outdated = True
+            with pytest.raises(OutdatedCookiesError):
+                await scraper.get_order(order(1))
+            assert session.auth is None
+            # The session is now invalid: no more requests are sent.
+            with pytest.raises(OutdatedCookiesError):
+                await scraper.generate_declaration(order(2, DeliveryProviders.MEEST))
+            assert len(requests) == 1
+
+            # A preflight checks again, and the session recovers once the
+            # cabinet accepts the cookies.
+            assert not await session.preflight()
+            outdated = False
+            assert await session.preflight()
+            await scraper.get_order(order(1))
+        finally:
+            await session.close()
+            await server.close()
+        return results
+
+    assert asyncio.run(run()) == [{"id": 42}] * 5
+    assert len(requests) == 3
+
+
+def test_unreachable_cabinet_leaves_scrapers_unavailable():
+    async def run():
+        server = TestServer(web.Application())
+        await server.start_server()
+        url = str(server.make_url("/"))
+        await server.close()
+
+        session = ScraperSession(base_url=url)
+        try:
+            assert await session.preflight()
+            with pytest.raises(ScraperUnavailableError):
+                await MeestScraperClient(session=session).generate_declaration(
+                    order(1, DeliveryProviders.MEEST),
+                )
+        finally:
+            await session.close()
+
+    asyncio.run(run())
+
+
+def test_run_steps_runs_independent_steps_concurrently():
+    events = []
+    both_started = asyncio.Event()
+
+    async def fetch(name):
+        events.append(("start", name))
+        if len(events) == 2:
+            both_started.set()
+        # Sequential steps would never see each other start.
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        events.append(("finish", name))
+        return name
+
+    async def combine(a, b):
+        return f"{a}+{b}"
+
+    results = asyncio.run(run_steps({
+        "a": (partial(fetch, "a"), ()),
+        "b": (partial(fetch, "b"), ()),
+        "c": (combine, ("a", "b")),
+    }))
+    assert results == {"a": "a", "b": "b", "c": "a+b"}
+    assert sorted(events[:2]) == [("start", "a"), ("start", "b")]
+
+
+def test_run_steps_cancels_remaining_steps_on_failure():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def fail():
+        raise OutdatedCookiesError
+
+    with pytest.raises(OutdatedCookiesError):
+        asyncio.run(run_steps({"slow": (slow, ()), "fail": (fail, ())}))
+    assert cancelled == ["slow"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_steps({"a": (fail, ("b",))}))
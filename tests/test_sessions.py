@@ -0,0 +1,34 @@
+import asyncio
+
+from src.sessions import SessionFactory
+
+
+def test_sessions_share_one_connector_and_are_closed_together():
+    async def run():
+        factory = SessionFactory(limit_per_host=5)
+        first = factory.create(base_url="http://127.0.0.1/")
+        second = factory.create()
+        connector = factory.connector
+
+        assert first.connector is second.connector is connector
+        assert connector.limit_per_host == 5
+
+        await first.close()
+        assert not connector.closed
+
+        await factory.close()
+        return first, second, connector
+
+    first, second, connector = asyncio.run(run())
+    assert first.closed and second.closed and connector.closed
+
+
+def test_closed_sessions_are_dropped_when_new_ones_are_created():
+    async def run():
+        async with SessionFactory() as factory:
+            for _ in range(3):
+                await factory.create().close()
+            live = factory.create()
+            assert factory.sessions == [live]
+
+    asyncio.run(run())